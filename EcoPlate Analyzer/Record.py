@@ -1,16 +1,67 @@
 # Record class
-'''Class for ecoplate experiment results with added info (1/3 of ecoplate)'''
+'''Class for ecoplate experiment results with added info (1/3 of ecoplate);
+    stored records are views of a row in the plate matrix'''
+
+import plate_matrix
+
+
+def _field(name):
+    def get(self):
+        if self.matrix is None:
+            return self._detached[name]
+        return self.matrix.value(name, self.row)
+    return property(get)
+
 
 class EcoplateExperimentRecord:
 
+    __slots__ = ("matrix", "row", "_detached")
+
     def __init__(self, bacteria, stressor, concentration, time, blank, repetition, ecoplate, file_name):
-        self.bacteria = bacteria
-        self.stressor = stressor
-        self.concentration = concentration
-        self.time = time
-        self.blank = blank
-        self.repetition = repetition
-        self.ecoplate = ecoplate
-        self.file_name = file_name
+        self.matrix = None      # plate matrix the record is stored in
+        self.row = None
+        self._detached = {
+            "bacteria": bacteria,
+            "stressor": stressor,
+            "concentration": concentration,
+            "time": time,
+            "blank": blank,
+            "repetition": repetition,
+            "file_name": file_name,
+            "ecoplate": ecoplate        # 8x4 float32 numpy array
+        }
+
+    @classmethod
+    def view(cls, matrix, row):
+        """Record of a row that is already in the plate matrix"""
+        record = cls.__new__(cls)
+        record.matrix = matrix
+        record.row = row
+        record._detached = None
+        return record
+
+    def attach(self, matrix, row):
+        """Move record info and ecoplate values to the row of the plate matrix"""
+        info = [self._detached[field] for field in plate_matrix.FIELDS]
+        matrix.set_row(row, info, self._detached["ecoplate"])
+        self.matrix = matrix
+        self.row = row
+        self._detached = None
+
+    bacteria = _field("bacteria")
+    stressor = _field("stressor")
+    concentration = _field("concentration")
+    time = _field("time")
+    blank = _field("blank")
+    repetition = _field("repetition")
+    file_name = _field("file_name")
 
+    @property
+    def ecoplate(self):
+        if self.matrix is None:
+            return self._detached["ecoplate"]
+        return self.matrix.values[self.row].copy()
 
+    @property
+    def record_id(self):
+        return self.row
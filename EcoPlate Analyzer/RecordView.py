@@ -0,0 +1,153 @@
+# Record list model and delegate for filtered data display
+'''Virtualized list of filtered records: the model keeps the records and their
+    ecoplate values (or selected carbon source values), the delegate paints a record card
+    only for the rows in the viewport, so no widgets are created per record'''
+
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QStyle
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize
+
+
+RECORD_KEYS = ["bacteria", "stressor", "concentration", "time", "blank", "repetition"]
+PLATE_ROWS = ["A", "B", "C", "D", "E", "F", "G", "H"]
+PLATE_COLUMNS = ["1", "2", "3", "4"]
+
+RECORD_ROLE = Qt.UserRole           # Record of the row
+MATRIX_ROLE = Qt.UserRole + 1       # matrix of the row as displayed / saved
+
+MARGIN = 8
+INFO_WIDTH = 190
+HEADER_WIDTH = 30
+VALUE_WIDTH = 60
+LABEL_WIDTH = 150
+
+
+class RecordListModel(QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.records = []
+        self.values = None      # N x 8 x 4 plates (mode 0) or N x len(labels) selected wells (mode 1, 2)
+        self.labels = []        # carbon sources (mode 1) or (group, carbon source) pairs (mode 2)
+        self.mode = 0
+
+    def setResults(self, records, values, mode=0, labels=()):
+        self.beginResetModel()
+        self.records = list(records)
+        self.values = values
+        self.mode = mode
+        self.labels = list(labels)
+        self.endResetModel()
+
+    def clear(self):
+        self.setResults([], None)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+
+    def matrix(self, row):
+        """Matrix of one record as displayed and saved (rows of the ecoplate or label/value rows)"""
+        if self.mode == 0:
+            return self.values[row]
+        if self.mode == 1:
+            return [[source, value] for source, value in zip(self.labels, self.values[row])]
+        return [[group, source, value] for (group, source), value in zip(self.labels, self.values[row])]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.records):
+            return None
+        record = self.records[index.row()]
+        if role == Qt.DisplayRole:
+            return ", ".join(str(getattr(record, key, "N/A")) for key in RECORD_KEYS)
+        if role == RECORD_ROLE:
+            return record
+        if role == MATRIX_ROLE:
+            return self.matrix(index.row())
+        return None
+
+
+class RecordDelegate(QStyledItemDelegate):
+    """Paints a record card: record info on the left, the ecoplate or the selected values on the right"""
+
+    def columns(self, model):
+        # (header, width) of the value table columns of the model mode
+        if model.mode == 0:
+            return [(label, VALUE_WIDTH) for label in PLATE_COLUMNS]
+        if model.mode == 1:
+            return [("Value", VALUE_WIDTH)]
+        return [("Carbon source", LABEL_WIDTH), ("Value", VALUE_WIDTH)]
+
+    def rowHeaders(self, model):
+        if model.mode == 0:
+            return PLATE_ROWS
+        if model.mode == 1:
+            return [str(label) for label in model.labels]
+        return [str(group) for group, _ in model.labels]
+
+    def headerWidth(self, model):
+        return HEADER_WIDTH if model.mode == 0 else LABEL_WIDTH
+
+    def sizeHint(self, option, index):
+        model = index.model()
+        line = option.fontMetrics.height() + 6
+        lines = max(len(RECORD_KEYS), len(self.rowHeaders(model)) + 1)
+        width = INFO_WIDTH + self.headerWidth(model) + sum(width for _, width in self.columns(model))
+        return QSize(width + 2 * MARGIN, lines * line + 2 * MARGIN)
+
+    def paint(self, painter, option, index):
+        model = index.model()
+        record = index.data(RECORD_ROLE)
+        matrix = index.data(MATRIX_ROLE)
+        line = option.fontMetrics.height() + 6
+        rect = option.rect.adjusted(MARGIN // 2, MARGIN // 2, -MARGIN // 2, -MARGIN // 2)
+
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(rect, option.palette.highlight())
+        painter.setPen(option.palette.mid().color())
+        painter.drawRect(rect)
+        painter.setPen(option.palette.text().color())
+
+        # record info
+        left = rect.left() + MARGIN // 2
+        top = rect.top() + MARGIN // 2
+        for row, key in enumerate(RECORD_KEYS):
+            cell = QRect(left, top + row * line, INFO_WIDTH, line)
+            painter.drawText(cell, Qt.AlignLeft | Qt.AlignVCenter, f"{key}:  {getattr(record, key, 'N/A')}")
+
+        # value table: header row, row headers and one cell per value
+        left += INFO_WIDTH
+        header_width = self.headerWidth(model)
+        x = left + header_width
+        for header, width in self.columns(model):
+            painter.drawText(QRect(x, top, width, line), Qt.AlignCenter, header)
+            x += width
+
+        grid_pen = option.palette.midlight().color()
+        text_pen = painter.pen()
+        for row, header in enumerate(self.rowHeaders(model)):
+            y = top + (row + 1) * line
+            painter.drawText(QRect(left, y, header_width - 4, line), Qt.AlignLeft | Qt.AlignVCenter,
+                             option.fontMetrics.elidedText(header, Qt.ElideRight, header_width - 4))
+            cells = matrix[row] if model.mode == 0 else matrix[row][1:]
+            x = left + header_width
+            for value, (_, width) in zip(cells, self.columns(model)):
+                cell = QRect(x, y, width, line)
+                painter.setPen(grid_pen)
+                painter.drawRect(cell)
+                painter.setPen(text_pen)
+                painter.drawText(cell.adjusted(3, 0, -3, 0), Qt.AlignLeft | Qt.AlignVCenter,
+                                 option.fontMetrics.elidedText(str(value), Qt.ElideRight, width - 6))
+                x += width
+        painter.restore()
+
+
+class RecordView(QListView):
+    """List view of a RecordListModel, all cards of a result have the same size"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.results_model = RecordListModel(self)
+        self.setModel(self.results_model)
+        self.setItemDelegate(RecordDelegate(self))
+        self.setUniformItemSizes(True)
+        self.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.setSelectionMode(QListView.SingleSelection)
@@ -0,0 +1,87 @@
+# Results table model and view for test results display
+'''Table model over the result columns (arrays, one per header): values are formatted
+    only when a cell is painted, sorting permutes the rows through a cached argsort
+    of the column and new results replace the arrays without rebuilding the view'''
+
+import numpy as np
+from PySide6.QtWidgets import QTableView
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+
+class ResultsTableModel(QAbstractTableModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.headers = []
+        self.columns = []
+        self.order = np.arange(0)       # displayed row -> result row
+        self.argsorts = {}              # column -> ascending argsort of the column
+        self.sort_column = -1           # -1: result order
+        self.sort_order = Qt.AscendingOrder
+
+    def setResults(self, headers, columns):
+        """Replace the results; columns is one sequence of values per header, all of the same length"""
+        self.beginResetModel()
+        self.headers = list(headers)
+        self.columns = [np.asarray(column) for column in columns]
+        self.argsorts = {}
+        self.order = self.sortedOrder(self.sort_column, self.sort_order)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        value = self.columns[index.column()][self.order[index.row()]]
+        if isinstance(value, np.floating):
+            return f"{value:.3f}"
+        return str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section] if section < len(self.headers) else None
+        return str(section + 1)
+
+    def sortKey(self, column):
+        # numeric text (concentration, time, repetition) is sorted by its value
+        values = self.columns[column]
+        if values.dtype.kind in "UO":
+            try:
+                return values.astype(np.float64)
+            except ValueError:
+                return values
+        return values
+
+    def sortedOrder(self, column, order):
+        """Result rows in the display order of the column sorted in the order"""
+        rows = len(self.columns[0]) if self.columns else 0
+        if column < 0 or column >= len(self.columns):
+            return np.arange(rows)
+        if column not in self.argsorts:
+            self.argsorts[column] = np.argsort(self.sortKey(column), kind='stable')
+        ascending = self.argsorts[column]
+        return ascending if order == Qt.AscendingOrder else ascending[::-1]
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self.sort_column = column
+        self.sort_order = order
+        self.order = self.sortedOrder(column, order)
+        self.layoutChanged.emit()
+
+
+class ResultsTableView(QTableView):
+    """Sortable view of a ResultsTableModel, unsorted until a header is clicked"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.results_model = ResultsTableModel(self)
+        self.setModel(self.results_model)
+        self.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.setSortingEnabled(True)
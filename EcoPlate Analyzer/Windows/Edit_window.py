@@ -6,8 +6,11 @@ from PySide6.QtWidgets import (
     QCheckBox, QErrorMessage)
 
 import app_state 
+import value_models
 import Record
 
+import numpy as np
+
 
 class EditWindow(QWidget):
     def __init__(self):
@@ -28,6 +31,7 @@ class EditWindow(QWidget):
 
         self.selected_file = []
         self.selected_records = []
+        self.plate = None       # 8x12 ecoplate values of the selected file (float32)
 
         self.ecoplate_labels = [[None for _ in range(13)] for _ in range(10)]       # matrix for ecoplate labels
         self.widgets_matrix = [[None for _ in range(6)] for _ in range(3)]          # matrix for ecoplate info input
@@ -44,7 +48,7 @@ class EditWindow(QWidget):
         label = QLabel("Choose dataset:")
         self.combobox = QComboBox()
         self.combobox.setFixedWidth(380)
-        self.combobox.addItems(self.filename)
+        value_models.attach(self.combobox, "filename")
 
         show_button = QPushButton("Show")
         show_button.setFixedWidth(150)
@@ -104,6 +108,8 @@ class EditWindow(QWidget):
                 else:
                     box = QComboBox()
                     box.setEditable(True)
+                    value_models.attach(box, label_names[y])
+                    box.setCurrentText("")
                     info_panel.addWidget(box, y, x)
                     self.widgets_matrix[x][y] = box
                     box.activated.connect(lambda _, col=x: self.ChangeLabelBackground(col))
@@ -136,12 +142,13 @@ class EditWindow(QWidget):
 
     def ShowButtonPushed(self):
         self.selected_file = self.combobox.currentText()
-        self.selected_records = self.records_dicts.get('filename', {}).get(self.selected_file, [])
+        self.selected_records = list(self.records_dicts.get('filename', {}).get(self.selected_file, {}).values())
 
         if len(self.selected_records) != 3:
             QMessageBox.warning(self, "Error ", f"Exactly 3 records were not found for the file: {self.selected_file}")
             return
 
+        self.plate = np.hstack([record.ecoplate for record in self.selected_records]).astype(np.float32)
         for i in range(3):
             record = self.selected_records[i]
             self.DisplayData(i, record)
@@ -149,19 +156,21 @@ class EditWindow(QWidget):
     def DeleteButtonPushed(self):
         record_count = len(self.all_records)
         self.DeleteData()
-        self.DeleteFromCombobox()
-        self.UpdateSets()
+        self.plate = None
         if(record_count - 3 == len(self.all_records)):
             self.Success_message("Records deleted successfully!")
 
 
     def UpdateButtonPushed(self):
+        if self.plate is None:
+            self.show_error("Show a dataset first.")
+            return
         if not self.Validate_input():
             return 
         record_count = len(self.all_records)
         self.DeleteData()
         self.AddNewRecord()
-        self.UpdateSets()
+        self.combobox.setCurrentText(self.selected_file)
 
         if(record_count == len(self.all_records)):
             self.Success_message("Records edited successfully!")
@@ -186,55 +195,12 @@ class EditWindow(QWidget):
                 self.ecoplate_labels[i][j].setText(str(value))
 
     def DeleteData(self):
-        records_to_remove = self.selected_records
-
-        for record_to_remove in records_to_remove:
-            for key, sub_dict in list(self.records_dicts.items()):  # copy of keys in lists
-                for sub_key, records in list(sub_dict.items()):  # copy of subkeys
-                    self.records_dicts[key][sub_key] = [record for record in records if id(record) != id(record_to_remove)]
-
-                    # delete subkey if subkey's list empty
-                    if not self.records_dicts[key][sub_key]:
-                        del self.records_dicts[key][sub_key]
-
-        records_to_remove = [record for record in self.all_records if record.file_name == self.selected_file]
-        for record in records_to_remove:
-            self.all_records.remove(record)
-
-
-    def DeleteFromCombobox(self):
-
-        # deleting combobox option
-        index = self.combobox.findText(self.selected_file)
-        if index != -1:
-            self.combobox.removeItem(index)
-
-        # deleting filname from filename set
-        if self.selected_file in self.filename:
-            self.filename.remove(self.selected_file)
-
-
-    def UpdateSets(self):
-        
-        self.bacteria_set.clear()
-        self.stressor_set.clear()
-        self.concentration_set.clear()
-        self.time_set.clear()
-        self.repetition_set.clear()
-
-        for key, sub_dict in self.records_dicts.items():  
-            for sub_key, records in sub_dict.items(): 
-                for record in records:
-                    # sets update
-                    self.bacteria_set.add(record.bacteria)
-                    self.stressor_set.add(record.stressor)
-                    self.concentration_set.add(record.concentration)
-                    self.time_set.add(record.time)
-                    self.repetition_set.add(record.repetition)
+        records_to_remove = list(self.records_dicts['filename'].get(self.selected_file, {}).values())
+        self.appState.remove_records(records_to_remove)
 
 
     def AddNewRecord(self):
-        
+        new_records = []
         for index in range(3):  # creating 3 new records
             
             bacteria = self.widgets_matrix[index][0].currentText()
@@ -243,44 +209,20 @@ class EditWindow(QWidget):
             time = self.widgets_matrix[index][3].currentText()
             blank = self.widgets_matrix[index][4].isChecked()
             repetition = self.widgets_matrix[index][5].currentText()
-            file_name = self.combobox.currentText()
+            file_name = self.selected_file
 
-            ecoplate_values = []
             start_col = index * 4
             end_col = start_col + 4
-
-            for i in range(2, 10):
-                row_values = []
-                for j in range(start_col+2, end_col+2):
-                    row_values.append(self.ecoplate_labels[i-1][j-1].text())
-                ecoplate_values.append(row_values)
+            ecoplate_values = self.plate[:, start_col:end_col].copy()
 
                 # creating a new record of data
             newRecord = Record.EcoplateExperimentRecord(
                 bacteria, stressor, concentration, time, blank, repetition, ecoplate_values, file_name)
-            self.appState.all_records.append(newRecord)
-
-                # adding values to combobox lists
-            if bacteria not in [self.widgets_matrix[index][0].itemText(i) for i in range(self.widgets_matrix[index][0].count())]:
-                self.widgets_matrix[index][0].addItem(bacteria)
-            if stressor not in [self.widgets_matrix[index][1].itemText(i) for i in range(self.widgets_matrix[index][1].count())]:
-                self.widgets_matrix[index][1].addItem(stressor)
-            if concentration not in [self.widgets_matrix[index][2].itemText(i) for i in range(self.widgets_matrix[index][2].count())]:
-                self.widgets_matrix[index][2].addItem(concentration)
-            if time not in [self.widgets_matrix[index][3].itemText(i) for i in range(self.widgets_matrix[index][3].count())]:
-                self.widgets_matrix[index][3].addItem(time)
-            if repetition not in [self.widgets_matrix[index][5].itemText(i) for i in range(self.widgets_matrix[index][5].count())]:
-                self.widgets_matrix[index][5].addItem(repetition)
-                
-                # adding record to dicts
-            self.appState.Records_dict['bacteria'].setdefault(newRecord.bacteria, []).append(newRecord)
-            self.appState.Records_dict['stressor'].setdefault(newRecord.stressor, []).append(newRecord)
-            self.appState.Records_dict['concentration'].setdefault(newRecord.concentration, []).append(newRecord)
-            self.appState.Records_dict['time'].setdefault(newRecord.time, []).append(newRecord)
-            self.appState.Records_dict['blank'].setdefault(newRecord.blank, []).append(newRecord)
-            self.appState.Records_dict['repetition'].setdefault(newRecord.repetition, []).append(newRecord)
-            self.appState.Records_dict.setdefault('filename', {}).setdefault(newRecord.file_name, []).append(newRecord)
-            self.appState.filename_set.add(file_name)
+
+            new_records.append(newRecord)
+
+        # adding records to dicts, in one store transaction
+        self.appState.add_records(new_records)
 
     
     def ChangeLabelBackground(self, col):
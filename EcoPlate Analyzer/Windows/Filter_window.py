@@ -2,14 +2,17 @@ from PySide6.QtWidgets import (
     QMessageBox,
     QVBoxLayout, QHBoxLayout, QGridLayout,
     QWidget, QPushButton, QLabel, QListWidget, 
-    QScrollArea, QFileDialog)
-
-from itertools import product
+    QFileDialog)
 
 import csv
+from bisect import bisect_left
 import os
 import app_state 
-from RecordWidget import RecordWidget
+import workers
+from RecordView import RecordView
+
+
+LIST_FIELDS = {"bacteria": 0, "stressor": 1, "concentration": 2, "time": 3, "repetition": 5}   # filter list of a field
 
 
 class FilterWindow(QWidget):
@@ -18,7 +21,7 @@ class FilterWindow(QWidget):
         self.setWindowTitle("EcoPlate Analyzer - Filter")
         self.appState = app_state.AppState.get_instance() 
 
-        self.saved_data = []        # container for all filtered data -> for .csv saving
+        self.saved_data = []        # filtered records (rows of the results model) -> for .csv saving
 
         self.appState = app_state.AppState.get_instance()
         self.bacteria_set = self.appState.bacteria_set
@@ -37,17 +40,15 @@ class FilterWindow(QWidget):
         # layouts
         self.main_layout = QVBoxLayout()
         filetrsPanel_layout = QGridLayout()
-        self.displayPanel_layout = QVBoxLayout()
         buttonsPanel_layout = QHBoxLayout()
 
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setMinimumHeight(275)
+        # results list, record cards are painted on demand
+        self.results_view = RecordView()
+        self.results_view.setMinimumHeight(275)
+        self.results_model = self.results_view.results_model
 
-        scroll_content_widget = QWidget()
-        scroll_content_widget.setFixedWidth(500)
-        scroll_content_widget.setLayout(self.displayPanel_layout)
-        self.scroll_area.setWidget(scroll_content_widget)
+        # filtering runs in the background
+        self.job_progress = workers.JobProgress(self)
         
 
         # filters panel
@@ -103,76 +104,41 @@ class FilterWindow(QWidget):
 
         # main layout
         self.main_layout.addLayout(filetrsPanel_layout)
-        self.main_layout.addWidget(self.scroll_area)
+        self.main_layout.addWidget(self.results_view)
+        self.main_layout.addWidget(self.job_progress)
         self.main_layout.addLayout(buttonsPanel_layout)
 
         self.setLayout(self.main_layout)
 
+        # filter lists follow the value sets
+        self.appState.subscribe(self.ValueSetChanged)
+
         # FUNCTIONS
+    def ValueSetChanged(self, field, value, added):
+        # adding/removing one option of the filter list of the field, lists stay sorted
+        col = LIST_FIELDS.get(field)
+        if col is None:
+            return
+        list_widget = self.list_widget[col]
+        items = [list_widget.item(i).text() for i in range(list_widget.count())]
+        index = bisect_left(items, value)
+        found = index < len(items) and items[index] == value
+        if added and not found:
+            list_widget.insertItem(index, value)
+        elif not added and found:
+            list_widget.takeItem(index)
+
     def FilterButtonPushed(self):
 
         # clear previous filter data
         self.saved_data = []
-        for i in reversed(range(self.displayPanel_layout.count())):
-            self.displayPanel_layout.itemAt(i).widget().deleteLater()
+        self.results_model.clear()
        
-        filtered_data = []
-        for items in self.list_widget[:6]:
-            selected_items = [item.text() for item in items.selectedItems()]
-            filtered_data.append(selected_items)
-
-        # default if no values
-        filtered_data = [data if data else ['default'] for data in filtered_data]
-        parameter_combinations = list(product(*filtered_data))
-
-        # results 
-        results = []
-
-        for combination in parameter_combinations:
-            criteria = {
-                "bacteria": combination[0],
-                "stressor": combination[1],
-                "concentration": combination[2],
-                "time": combination[3],
-                "blank": combination[4],
-                "repetition": combination[5]
-            }
-
-
-            # dynamic filtration based on criteria
-            matching_records = None
-
-            if criteria["blank"] != "default":
-                blank_value = criteria["blank"] == "Yes"
-                blank_records = set(self.records_dicts["blank"].get(blank_value, []))
-                if matching_records is None:
-                    matching_records = blank_records
-
-
-            for key, value in criteria.items():
-                if key == "blank":
-                    continue
-
-
-                if value == "default":
-                    candidates = set(
-                        record for records in self.records_dicts[key].values() for record in records
-                        )
-                else:
-                    candidates = set(self.records_dicts[key].get(value, []))
-
-                # initialization and narrowing down the records
-                if matching_records is None:
-                    matching_records = candidates
-                else:
-                    matching_records.intersection_update(candidates)
-
-            
-            if matching_records:
-                results.extend(matching_records)
-
-            results = list(set(results))
-
+        # selected values of every field (no selection -> all values)
+        selections = {}
+        for key, items in zip(["bacteria", "stressor", "concentration", "time", "blank", "repetition"], self.list_widget[:6]):
+            selections[key] = [item.text() for item in items.selectedItems()]
+        selections["blank"] = [value == "Yes" for value in selections["blank"]]
 
         # chcecking  if carbon source (groups) filters are choosen
         selected_carbon_sources = [item.text() for item in self.list_widget[6].selectedItems()]
@@ -181,61 +147,18 @@ class FilterWindow(QWidget):
         if selected_carbon_sources and selected_carbon_groups:
             QMessageBox.warning(self, "ERROR", "You can filter by carbon sources OR carbon sources groups.")
             return
-                
 
-    # Displaying filtered data
+        # results (bitmap index query) and a copy of their plates taken here, their values gathered in the background;
+        # a new filter supersedes a running one
+        inputs = workers.filter_inputs(self.appState, selections, selected_carbon_sources, selected_carbon_groups)
+        self.job_progress.submit("filter", workers.filter_job, *inputs, finished=self.ShowResults)
 
-        for record in results:
-            # no carbon source -> display full matrix
-            if not selected_carbon_sources and not selected_carbon_groups:
-                matrix = getattr(record, "ecoplate", [[0] * 4 for _ in range(8)])  
-                record_widget = RecordWidget(record, matrix, 0) 
-                self.displayPanel_layout.addWidget(record_widget)
-                self.saved_data.append((record, matrix))        # for csv saving
 
-            # carbon sources
-            elif selected_carbon_sources and not selected_carbon_groups:
-                coords = []
-                
-                for selected_source in selected_carbon_sources:
-                    for row_idx, row in enumerate(self.carbon_sources):
-                        if selected_source in row:
-                            col_idx = row.index(selected_source)  # row id
-                            coords.append((selected_source, row_idx, col_idx))  # adding coords (row, column)
-                
-                
-                matrix = []
-                for (selected_source, row_idx, col_idx) in coords:
-                    value = record.ecoplate[row_idx][col_idx]  # taking value from ecoplate matrix
-                    matrix.append([selected_source, value])
-
-
-                record_widget = RecordWidget(record, matrix, 1) 
-                self.displayPanel_layout.addWidget(record_widget)
-                self.saved_data.append((record, matrix))        # for csv saving
-        
-            elif selected_carbon_groups and not selected_carbon_sources:
-                coords = []
-
-                for group in selected_carbon_groups:
-                    if group in self.carbon_sources_groups:
-                        group_sources = self.carbon_sources_groups[group]
-                        for source in group_sources:
-                            for row_idx, row in enumerate(self.carbon_sources):
-                                if source in row:
-                                    col_idx = row.index(source)
-                                    coords.append((group, source, row_idx, col_idx))
-
-                # Retrieve values from the ecoplate matrix
-                matrix = []
-                for (group, source, row_idx, col_idx) in coords:
-                    value = record.ecoplate[row_idx][col_idx]  # Get value from the ecoplate matrix
-                    matrix.append([group, source, value])
-
-                # Create RecordWidget with the filtered data
-                record_widget = RecordWidget(record, matrix, 2)
-                self.displayPanel_layout.addWidget(record_widget)
-                self.saved_data.append((record, matrix))        # for csv saving
+    def ShowResults(self, filtered):
+        # Displaying filtered data: no carbon source -> full matrix, carbon sources (groups) -> selected wells
+        results, values, mode, labels = filtered
+        self.results_model.setResults(results, values, mode, labels)
+        self.saved_data = list(results)        # for csv saving
 
 
     def SaveButtonPushed(self):
@@ -262,7 +185,7 @@ class FilterWindow(QWidget):
                 writer.writerow(["Bacteria", "Stressor", "Concentration", "Time", "Blank", "Repetition"])
 
                 # save the data
-                for record, matrix in self.saved_data:
+                for row, record in enumerate(self.saved_data):
                     writer.writerow([
                         record.bacteria,
                         record.stressor,
@@ -271,8 +194,8 @@ class FilterWindow(QWidget):
                         record.blank,
                         record.repetition
                     ])
-                    for row in matrix:
-                        writer.writerow(row)  
+                    for matrix_row in self.results_model.matrix(row):
+                        writer.writerow(matrix_row)  
                         
             # Clear saved_data after successful export
             self.saved_data = []
@@ -5,15 +5,18 @@
 # importing project files
 import Record
 import app_state
+import plate_cache
+import batch_import
+import value_models
+import workers
 from Windows.Filter_window import FilterWindow
 from Windows.Tests_window import TestsWindow
 from Windows.Edit_window import EditWindow
 
 import os
-import pandas as pd
 import numpy as np
 
-from PySide6.QtCore import (Qt, QTimer)
+from PySide6.QtCore import (Qt, QTimer, QThreadPool)
 from PySide6.QtWidgets import (
 
     QMainWindow, QWidget,
@@ -26,6 +29,7 @@ from PySide6.QtWidgets import (
 #   ***********************
 
 FILE_FILTERS = ["Microsoft Excel (*.xlsx)"]
+COMBOBOX_FIELDS = {"bacteria": 0, "stressor": 1, "concentration": 2, "time": 3, "repetition": 5}   # info panel column of a field
 ecoplate_labels = [[None for _ in range(13)] for _ in range(10)]       # matrix for ecoplate labels
 
 def load_ecoplate_view(wave):
@@ -33,17 +37,44 @@ def load_ecoplate_view(wave):
         for y in range(1, 9):
             label = ecoplate_labels[y][x]
             if label is not None:
-                label.setText(str(wave.iloc[y - 1, x - 1]))  
+                label.setText(str(wave[y - 1, x - 1]))  
             else:
                 print(f"Error: QLabel at ({y}, {x}) is None!")
 
 
+def clear_ecoplate_view():
+    for row in ecoplate_labels:
+        for label in row:
+            if label is not None:
+                label.setText("")
+
+
+def load_plate_job(job, file_path):
+    # background parsing of a workbook (plate cache on the loader thread)
+    return plate_cache.load_plate(file_path).astype(np.float32)
+
+
+def import_folder_job(job, directory, manifest_path, loaded_files):
+    # background reading of the manifest and parsing of its workbooks, records are added in the GUI thread
+    return batch_import.parse_folder(directory, manifest_path, loaded_files)
+
+
 # Subclass QMainWindow to customize application's main window
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
 
         self.file_name = None
+        self.plate = None       # loaded 8x12 ecoplate values (float32), labels are only a view of it
+        self.plate_path = None      # path of the current file, its plate may still be parsing
+        self.plate_queue = []       # paths of the files opened after the current one
+        self.parsed_plates = {}     # path -> parsed plate of the current and queued files
+
+        # workbooks are parsed in the background one at a time, in the order they were opened
+        loader_pool = QThreadPool(self)
+        loader_pool.setMaxThreadCount(1)
+        self.plate_loader = workers.JobRunner(self, pool=loader_pool)
+        self.import_jobs = workers.JobRunner(self)       # folder imports, parsed on the global pool
         self.appState = app_state.AppState.get_instance()
         self.widgets_matrix = [[None for _ in range(6)] for _ in range(3)]       # matrix for comboboxes info panel
 
@@ -94,6 +125,9 @@ class MainWindow(QMainWindow):
         button_LoadFile = QPushButton("Load File")
         button_LoadFile.clicked.connect(self.get_filename)
 
+        button_ImportFolder = QPushButton("Import Folder")
+        button_ImportFolder.clicked.connect(self.ImportFolderButtonPushed)
+
         button_Filter = QPushButton("Filter")
         button_Filter.clicked.connect(self.FilterButtonPushed)
 
@@ -104,15 +138,22 @@ class MainWindow(QMainWindow):
         button_Tests.clicked.connect(self.TestsButtonPushed)
 
         button_LoadFile.setFixedWidth(200)
+        button_ImportFolder.setFixedWidth(200)
         button_Edit.setFixedWidth(200)
         button_Filter.setFixedWidth(200)
         button_Tests.setFixedWidth(200)
 
         buttonPanel_layout.addWidget(button_LoadFile)
+        buttonPanel_layout.addWidget(button_ImportFolder)
         buttonPanel_layout.addWidget(button_Edit)
         buttonPanel_layout.addWidget(button_Filter)
         buttonPanel_layout.addWidget(button_Tests)
 
+        self.load_label = QLabel("")       # loading indicator and queued files
+        self.load_label.setFixedWidth(200)
+        self.load_label.setWordWrap(True)
+        buttonPanel_layout.addWidget(self.load_label)
+
         #   info labels
         label_names = ["bacteria", "stressor", "concentration", "time", "blank", "repetition"]
         for x in range(0,6):
@@ -161,6 +202,9 @@ class MainWindow(QMainWindow):
         widget.setLayout(main_layout)
         self.setCentralWidget(widget)
 
+        # options of records loaded from the store, then kept current by value set changes (shared models)
+        self.UpdateComboboxes()
+
 
 # FUNCTIONS
             
@@ -171,25 +215,116 @@ class MainWindow(QMainWindow):
         dialog.setWindowTitle(caption)
         dialog.setDirectory(initial_dir)
         dialog.setNameFilter("Excel Files (*.xlsx *xls)")
-        dialog.setFileMode(QFileDialog.ExistingFile)
+        dialog.setFileMode(QFileDialog.ExistingFiles)
         if dialog.exec():
-            file_path = dialog.selectedFiles()[0]
+            self.OpenFiles(dialog.selectedFiles())
+
+        else:
+            self.show_error("No file has been chosen.")
+            return None
 
-            self.file_name = os.path.basename(file_path)
 
-            wave_590 = pd.read_excel(file_path, usecols='B:M', skiprows=lambda x: x < 5 or x > 13)
-            wave_720 = pd.read_excel(file_path, usecols='B:M', skiprows=lambda x: x < 18 or x > 26)
-            wave = round((wave_590 - wave_720), 3)
+    def OpenFiles(self, file_paths):
+        # the first file becomes the current one, the others are queued; all are parsed in the background.
+        # While files are queued, the user chooses between adding the new files after them and discarding them
+        if self.plate_queue:
+            answer = QMessageBox.question(
+                self, "Queued files",
+                f"{len(self.plate_queue)} opened files are still waiting to be added.\n"
+                "Add the new files after them? (No discards the queued files.)",
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel, QMessageBox.Yes)
+            if answer == QMessageBox.Cancel:
+                return
+            if answer == QMessageBox.Yes:
+                new_paths = [path for path in dict.fromkeys(file_paths) if path != self.plate_path and path not in self.plate_queue]
+                self.plate_queue.extend(new_paths)
+                self.LoadPlates(new_paths)
+                self.UpdateLoadLabel()
+                return
+
+        # the replaced files are not parsed any more (waiting jobs are dropped, results of running ones ignored)
+        for path in [self.plate_path] + self.plate_queue:
+            if path is not None and path not in file_paths:
+                self.plate_loader.cancel(path)
+
+        self.plate_queue = list(file_paths[1:])
+        self.parsed_plates = {path: plate for path, plate in self.parsed_plates.items() if path in file_paths}
+        self.LoadPlates(file_paths)
+        self.ShowPlate(file_paths[0])
+
+
+    def LoadPlates(self, file_paths):
+        # parse the files not parsed or parsing yet in the background, in this order
+        for file_path in file_paths:
+            if file_path not in self.parsed_plates and not self.plate_loader.running(file_path):
+                self.plate_loader.submit(file_path, load_plate_job, file_path,
+                                         finished=lambda wave, file_path=file_path: self.PlateLoaded(file_path, wave),
+                                         failed=lambda message, file_path=file_path: self.PlateFailed(file_path, message))
+
+
+    def ShowPlate(self, file_path):
+        # current file: its plate is displayed when parsed, until then the view is empty
+        self.plate_path = file_path
+        self.file_name = None
+        self.plate = None
+        wave = self.parsed_plates.get(file_path)
+        if wave is None:
+            clear_ecoplate_view()
+        else:
+            self.file_name = os.path.basename(file_path)
+            self.plate = wave
             load_ecoplate_view(wave)
+        self.UpdateLoadLabel()
+
+
+    def NextPlate(self):
+        # records of the current file were added: the next queued file becomes the current one
+        self.parsed_plates.pop(self.plate_path, None)
+        if self.plate_queue:
+            self.ShowPlate(self.plate_queue.pop(0))
+
 
+    def PlateLoaded(self, file_path, wave):
+        if file_path != self.plate_path and file_path not in self.plate_queue:
+            return      # no longer opened
+        self.parsed_plates[file_path] = wave
+        if file_path == self.plate_path:
+            self.ShowPlate(file_path)
         else:
-            self.show_error("No file has been chosen.")
-            return None
+            self.UpdateLoadLabel()
+
+
+    def PlateFailed(self, file_path, message):
+        if file_path in self.plate_queue:
+            self.plate_queue.remove(file_path)
+        elif file_path == self.plate_path:
+            # the next queued file becomes the current one
+            self.plate_path = None
+            if self.plate_queue:
+                self.ShowPlate(self.plate_queue.pop(0))
+        else:
+            return
+        self.UpdateLoadLabel()
+        self.show_error(f"Failed to read the file {os.path.basename(file_path)}: {message}")
+
+
+    def UpdateLoadLabel(self):
+        lines = []
+        if self.plate_path is not None and self.plate is None:
+            lines.append(f"Loading {os.path.basename(self.plate_path)}...")
+        if self.plate_queue:
+            parsed = sum(path in self.parsed_plates for path in self.plate_queue)
+            lines.append(f"Queued files: {len(self.plate_queue)}, parsed: {parsed}")
+        self.load_label.setText("\n".join(lines))
+
    
     def AddButtonPushed(self):  
 
         if not self.file_name: 
-            self.show_error("No file has been loaded. Please load a file first.")
+            if self.plate_path is not None:
+                self.show_error("The file is still loading. Please wait until its values are displayed.")
+            else:
+                self.show_error("No file has been loaded. Please load a file first.")
             return 
 
         if not self.Validate_input():
@@ -208,15 +343,9 @@ class MainWindow(QMainWindow):
             blank = self.widgets_matrix[index][4].isChecked()
             repetition = self.widgets_matrix[index][5].currentText()
 
-            ecoplate_values = []
             start_col = index * 4
             end_col = start_col + 4
-
-            for i in range(2, 10):
-                row_values = []
-                for j in range(start_col+2, end_col+2):
-                        row_values.append(ecoplate_labels[i-1][j-1].text())
-                ecoplate_values.append(row_values)
+            ecoplate_values = self.plate[:, start_col:end_col].copy()
 
             # creating a new record of data
             newRecord = Record.EcoplateExperimentRecord(
@@ -236,96 +365,78 @@ class MainWindow(QMainWindow):
                         self.show_error("Duplicate records found among the three inputs. No records were added.")
                         return 
 
-        # check if new records are not in data base yet
-        for record in new_records:
-                if self.record_exists(record):
-                    self.show_error("One or more records already exist. No records were added.")
-                    return
-
+        # check if new records are not in data base yet (hash index lookups) and their ecoplate values differ
+        new_plates = set()
         for record in new_records:
+            if self.appState.key_exists(record):
+                self.show_error("One or more records already exist. No records were added.")
+                return
 
-            # chceck for duplicates without ecoplate atribute (in data base)
-            for existing_record in self.appState.all_records:
-                if (record.bacteria == existing_record.bacteria and
-                    record.stressor == existing_record.stressor and
-                    record.concentration == existing_record.concentration and
-                    record.time == existing_record.time and
-                    record.repetition == existing_record.repetition):
-                    self.show_error("One or more records already exist. No records were added.")
-                    return
-
-            # check only ecoplate (in data base)
-            if any(existing_record.ecoplate == record.ecoplate for existing_record in self.appState.all_records):
+            plate = self.appState.plate_key(record.ecoplate)
+            if plate in new_plates or self.appState.plate_exists(record.ecoplate):
                 self.show_error("One or more records already exist with the same ecoplate values. No records were added.")
                 return
+            new_plates.add(plate)
 
-            # adding record to dicts
-            self.appState.Records_dict['bacteria'].setdefault(record.bacteria, []).append(record)
-            self.appState.Records_dict['stressor'].setdefault(record.stressor, []).append(record)
-            self.appState.Records_dict['concentration'].setdefault(record.concentration, []).append(record)
-            self.appState.Records_dict['time'].setdefault(record.time, []).append(record)
-            self.appState.Records_dict['blank'].setdefault(record.blank, []).append(record)
-            self.appState.Records_dict['repetition'].setdefault(record.repetition, []).append(record)
-            self.appState.Records_dict.setdefault('filename', {}).setdefault(record.file_name, []).append(record)
-            self.appState.filename_set.add(self.file_name)
+        self.appState.add_records(new_records)
+        self.ClearComboboxes()
 
-            self.appState.all_records.append(record)
+        # message
+        if(record_count_before + 3 == len(self.appState.all_records)):
+            self.info_label.setText("Records successfully added!")
+            QTimer.singleShot(3000, self.clear_label_text)
+            self.NextPlate()
 
-        # Adding values from comboboxes to sets
-        for col_index in [0, 1, 2, 3, 5]:
+
+    def UpdateComboboxes(self):
+        # comboboxes show the shared value models of their fields, no options are copied
+        for field, col_index in COMBOBOX_FIELDS.items():
             for row in self.widgets_matrix:
-                combo_box = row[col_index]
-                if isinstance(combo_box, QComboBox):
-                    value = combo_box.currentText()
-                    if col_index == 0:
-                        self.appState.bacteria_set.add(value)
-                    elif col_index == 1:
-                        self.appState.stressor_set.add(value)
-                    elif col_index == 2:
-                        self.appState.concentration_set.add(value)
-                    elif col_index == 3:
-                        self.appState.time_set.add(value)
-                    elif col_index == 5:
-                        self.appState.repetition_set.add(value)
-
-        #adding options to comboboxes
-        for row in self.widgets_matrix:
-            for col_index in [0, 1, 2, 3, 5]: 
-                combo_box = row[col_index]
-                if isinstance(combo_box, QComboBox):
-                    combo_box.clear()
-                    if col_index == 0:
-                        # (bacteria_set)
-                        for value in self.appState.bacteria_set:
-                            if value not in [combo_box.itemText(i) for i in range(combo_box.count())]:
-                                combo_box.addItem(value)
-                    elif col_index == 1:
-                        #  (stressor_set)
-                        for value in self.appState.stressor_set:
-                            combo_box.addItem(value)
-                    elif col_index == 2:
-                        #  (concentration_set)
-                        for value in self.appState.concentration_set:
-                            combo_box.addItem(value)
-                    elif col_index == 3:
-                        # (time_set)
-                        for value in self.appState.time_set:
-                            combo_box.addItem(value)
-                    elif col_index == 5:
-                        # (repetiton_set)
-                        for value in self.appState.repetition_set:
-                            combo_box.addItem(value)
+                value_models.attach(row[col_index], field)
+
+        self.ClearComboboxes()
+
 
+    def ClearComboboxes(self):
         for row in self.widgets_matrix:
-            for col_index in [0, 1, 2, 3, 5]: 
-                combo_box = row[col_index]
-                if isinstance(combo_box, QComboBox):
-                    combo_box.setCurrentText("")
+            for col_index in COMBOBOX_FIELDS.values():
+                row[col_index].setCurrentText("")
 
-        # message
-        if(record_count_before + 3 == len(self.appState.all_records)):
-            self.info_label.setText("Records successfully added!")
-            QTimer.singleShot(3000, self.clear_label_text)
+
+    def ImportFolderButtonPushed(self):
+        directory = QFileDialog.getExistingDirectory(self, "Import folder")
+        if not directory:
+            self.show_error("No folder has been chosen.")
+            return
+
+        manifest_path = os.path.join(directory, batch_import.MANIFEST_NAME)
+        if not os.path.isfile(manifest_path):
+            manifest_path, _ = QFileDialog.getOpenFileName(self, "Open manifest", directory, "CSV Files (*.csv)")
+            if not manifest_path:
+                self.show_error("No manifest file has been chosen.")
+                return
+
+        # workbooks are parsed in the background, a copy of the loaded file names is checked there
+        self.info_label.setText("Importing...")
+        self.import_jobs.submit("import", import_folder_job, directory, manifest_path, set(self.appState.filename_set),
+                                finished=self.FolderParsed, failed=self.ImportFailed)
+
+
+    def FolderParsed(self, parsed):
+        try:
+            new_records = batch_import.add_folder(*parsed)
+        except Exception as e:
+            self.ImportFailed(str(e))
+            return
+
+        self.ClearComboboxes()
+        self.info_label.setText(f"{len(new_records)} records successfully added!")
+        QTimer.singleShot(3000, self.clear_label_text)
+
+
+    def ImportFailed(self, message):
+        self.info_label.setText("")
+        self.show_error(f"Import failed: {message}")
 
 
     def clear_label_text(self):
@@ -390,20 +501,6 @@ class MainWindow(QMainWindow):
             
         return True
     
-    def record_exists(self, new_record):
-        for record in self.appState.all_records:
-            if (record.bacteria == new_record.bacteria and
-                record.stressor == new_record.stressor and
-                record.concentration == new_record.concentration and
-                record.time == new_record.time and
-                record.blank == new_record.blank and
-                record.repetition == new_record.repetition and
-                record.file_name == new_record.file_name or
-                np.array_equal(record.ecoplate, new_record.ecoplate)):
-                return True
-        return False
-
-
     def show_error(self, message):
         QMessageBox.warning(self, "ERROR", message)
 
@@ -5,19 +5,93 @@ from PySide6.QtWidgets import (
     QVBoxLayout, QHBoxLayout, QGridLayout,
     QWidget, QPushButton, QLabel, QListWidget, 
     QScrollArea, QFileDialog,
-    QTableWidget, QTableWidgetItem)
-
-from itertools import product
+    QCheckBox, QDoubleSpinBox, QComboBox)
 
 import csv
-import math
+import os
+from bisect import bisect_left
+import aggregation
+import bootstrap
 import app_state
-from RecordWidget import RecordWidget
+import blank_correction
+import metrics
+import pca
+import workers
+from RecordView import RecordView
+from ResultsTable import ResultsTableView
 
 import matplotlib.pyplot as plt
 import numpy as np
 import matplotlib.colors as mcolors
-import matplotlib.cm as cm
+
+
+LIST_FIELDS = {"bacteria": 0, "stressor": 1, "concentration": 2, "time": 3, "repetition": 5}   # filter list of a field
+PCA_COMPONENTS = 3
+RESULT_TYPES = ("AWCD", "SAWCD", "Shannon Index", "Shannon Evenness", "Simpson Index", "McIntosh Index", "Richness", "Gini Evenness")
+
+
+class MetricRequest:
+    """Metrics of records for a background job, taken in the GUI thread: the values found in the metric cache
+    and a copy of the well inputs of the other records; the job computes only on the copy,
+    the computed values are cached in the GUI thread when the job is done"""
+
+    def __init__(self, appState, records, names, groups, blank_corrected, threshold):
+        self.records = records
+        self.names = names
+        self.groups = groups        # None: whole-plate metrics, otherwise SAWCD of a carbon group or a single carbon source
+        self.wells = [None if group is None else appState.carbon_wells(group) for group in groups]
+        self.threshold = threshold
+        self.blank_corrected = blank_corrected
+        self.computed = [{} for _ in groups]
+
+        if blank_corrected:
+            # blank corrected values depend on the blank records too, they are not memoized
+            self.tables = [{name: [None] * len(records) for name in names} for _ in groups]
+            self.missing = list(range(len(records)))
+            self.inputs = blank_correction.blank_inputs(appState, records)
+        else:
+            lookups = [appState.cached_metrics(records, names, group) for group in groups]
+            self.tables = [table for table, _ in lookups]
+            self.missing = sorted(set().union(*(missing for _, missing in lookups)))
+            self.inputs = (appState.take_plates([records[index] for index in self.missing]), None)
+
+
+    def compute(self, job=None):
+        """Compute the metrics of the records missing in the cache chunk by chunk, a job is checked after every chunk;
+        returns the tables of the groups, {metric: values} of all records"""
+        values = blank_correction.well_values(*self.inputs)
+        steps = [(index, start, stop) for index in range(len(self.groups)) for start, stop in workers.chunks(len(values))]
+        parts = [[] for _ in self.groups]
+        for step, (index, start, stop) in enumerate(steps):
+            if self.wells[index] is None:
+                parts[index].append(metrics.community_metrics(values[start:stop], metrics.WATER_MASK, self.threshold))     # water well is masked out
+            else:
+                parts[index].append({"SAWCD": metrics.sawcd(values[start:stop], [self.wells[index]])[:, 0]})
+            if job is not None:
+                job.check(step + 1, len(steps))
+
+        for table, computed, group_parts in zip(self.tables, self.computed, parts):
+            for name in (group_parts[0] if group_parts else ()):
+                computed[name] = np.concatenate([part[name] for part in group_parts])
+            for name, column in table.items():
+                if name in computed:
+                    for index, value in zip(self.missing, computed[name].tolist()):
+                        column[index] = value
+        return self.tables
+
+
+    def cache(self, appState):
+        """Cache the computed values in the metric cache of AppState (GUI thread)"""
+        if self.blank_corrected:
+            return
+        missing_records = [self.records[index] for index in self.missing]
+        for group, computed in zip(self.groups, self.computed):
+            appState.cache_metrics(missing_records, computed, group)
+
+
+def test_values(tables, metric):
+    """Values of a test in the order of the test results: record by record, group by group (SAWCD)"""
+    return np.column_stack([table[metric] for table in tables]).ravel()
 
 
 class TestsWindow(QWidget):
@@ -30,6 +104,8 @@ class TestsWindow(QWidget):
         self.result_type = "AWCD"  # Default result type for graphs
 
         self.saved_data = []        # container for all filtered data -> for .csv saving
+        self.pca_model = None       # PCA of the saved data, kept for recolouring and export
+        self.pca_key = None
         
         # saving sets for comboboxes options
         self.bacteria_set = self.appState.bacteria_set
@@ -55,30 +131,74 @@ class TestsWindow(QWidget):
 
         # buttons tests panel
         AWCD_button = QPushButton("AWCD")
-        AWCD_button.clicked.connect(self.CalculateAWCD)     
-        AWCD_button.clicked.connect(lambda: self.SetResultType("AWCD")) 
+        AWCD_button.clicked.connect(lambda: self.RunTest("AWCD"))
         AWCD_button.setFixedWidth(150)
 
         SAWCD_button = QPushButton("SAWCD")
-        SAWCD_button.clicked.connect(self.CalculateSAWCD)   
+        SAWCD_button.clicked.connect(lambda: self.RunTest("SAWCD"))
         SAWCD_button.setFixedWidth(150)
-        SAWCD_button.clicked.connect(lambda: self.SetResultType("SAWCD")) 
 
         ShannonIndex_button = QPushButton("Shannon index")
-        ShannonIndex_button.clicked.connect(self.CalculateShannonIndex) 
+        ShannonIndex_button.clicked.connect(lambda: self.RunTest("Shannon Index"))
         ShannonIndex_button.setFixedWidth(150)
-        ShannonIndex_button.clicked.connect(lambda: self.SetResultType("Shannon Index"))
 
         ShannonEvenness_button = QPushButton("Shannon evenness")
-        ShannonEvenness_button.clicked.connect(self.CalculateShannonEvenness)   
+        ShannonEvenness_button.clicked.connect(lambda: self.RunTest("Shannon Evenness"))
         ShannonEvenness_button.setFixedWidth(150)
-        ShannonEvenness_button.clicked.connect(lambda: self.SetResultType("Shannon Evenness"))
 
         testsButtonsPanel_layout.addWidget(AWCD_button)
         testsButtonsPanel_layout.addWidget(SAWCD_button)
         testsButtonsPanel_layout.addWidget(ShannonIndex_button)
         testsButtonsPanel_layout.addWidget(ShannonEvenness_button)
 
+        # other diversity indices, computed in the same pass as AWCD and Shannon
+        for button_text, result_type in [("Simpson index", "Simpson Index"), ("McIntosh index", "McIntosh Index"),
+                                         ("Richness", "Richness"), ("Gini evenness", "Gini Evenness")]:
+            index_button = QPushButton(button_text)
+            index_button.clicked.connect(lambda _, result_type=result_type: self.RunTest(result_type))
+            index_button.setFixedWidth(150)
+            testsButtonsPanel_layout.addWidget(index_button)
+
+        testsButtonsPanel_layout.addWidget(QLabel("Richness threshold (OD):"))
+        self.richness_threshold = QDoubleSpinBox()
+        self.richness_threshold.setRange(0.0, 4.0)
+        self.richness_threshold.setSingleStep(0.05)
+        self.richness_threshold.setValue(metrics.RICHNESS_THRESHOLD)
+        self.richness_threshold.setFixedWidth(150)
+        testsButtonsPanel_layout.addWidget(self.richness_threshold)
+
+        RichnessSweep_button = QPushButton("Richness sweep")
+        RichnessSweep_button.clicked.connect(self.RichnessSweep)
+        RichnessSweep_button.setFixedWidth(150)
+        testsButtonsPanel_layout.addWidget(RichnessSweep_button)
+
+        # PCA of the substrate profiles
+        testsButtonsPanel_layout.addWidget(QLabel("PCA colour by:"))
+        self.pca_colour = QComboBox()
+        self.pca_colour.addItems(["stressor", "concentration", "time", "bacteria", "repetition"])
+        self.pca_colour.setFixedWidth(150)
+        testsButtonsPanel_layout.addWidget(self.pca_colour)
+
+        PCA_button = QPushButton("PCA")
+        PCA_button.clicked.connect(self.SavePCAGraph)
+        PCA_button.setFixedWidth(150)
+        testsButtonsPanel_layout.addWidget(PCA_button)
+
+        SavePCA_button = QPushButton("Save PCA to .csv")
+        SavePCA_button.clicked.connect(self.SavePCAToCSV)
+        SavePCA_button.setFixedWidth(150)
+        testsButtonsPanel_layout.addWidget(SavePCA_button)
+
+        Bootstrap_button = QPushButton("Bootstrap CI to .csv")
+        Bootstrap_button.clicked.connect(self.SaveBootstrapToCSV)
+        Bootstrap_button.setFixedWidth(150)
+        testsButtonsPanel_layout.addWidget(Bootstrap_button)
+
+        # metrics of blank corrected values
+        self.blank_checkbox = QCheckBox("Blank corrected")
+        self.blank_checkbox.setToolTip("Subtract the mean of the blank records with the same bacteria, time and file")
+        testsButtonsPanel_layout.addWidget(self.blank_checkbox)
+
         # display panel
         self.scroll_area = QScrollArea()
         self.scroll_area.setWidgetResizable(True)
@@ -89,6 +209,15 @@ class TestsWindow(QWidget):
         scroll_content_widget.setLayout(self.displayPanel_layout)
         self.scroll_area.setWidget(scroll_content_widget)
 
+        # filtered records list and results table, kept between results (only their model data is replaced)
+        self.records_view = RecordView()
+        self.records_view.hide()
+        self.results_view = ResultsTableView()
+        self.results_view.hide()
+
+        # filtering and tests run in the background
+        self.job_progress = workers.JobProgress(self)
+
         # filters panel
         label_names = ["bacteria", "stressor", "concentration", "time", "blank", "repetition", "carbon sources", "carbon sources groups"]
         self.list_widget = []    #listWidgets storage
@@ -132,9 +261,14 @@ class TestsWindow(QWidget):
         save_graph_button.setFixedWidth(150)
         save_graph_button.clicked.connect(self.SaveGraph)
 
+        save_summary_button = QPushButton("Save summary to .csv")
+        save_summary_button.setFixedWidth(150)
+        save_summary_button.clicked.connect(self.SaveSummaryToCSV)
+
         buttonsPanel_layout.addWidget(filter_button)
         buttonsPanel_layout.addWidget(save_graph_button)
         buttonsPanel_layout.addWidget(save_button)
+        buttonsPanel_layout.addWidget(save_summary_button)
 
         # view and tests buttons layout
         viewAndTestsButtonsPanel_layout.addLayout(testsButtonsPanel_layout)
@@ -143,13 +277,32 @@ class TestsWindow(QWidget):
         # main layout
         self.main_layout.addLayout(filetrsPanel_layout)
         self.main_layout.addLayout(viewAndTestsButtonsPanel_layout)
+        self.main_layout.addWidget(self.job_progress)
         self.main_layout.addLayout(buttonsPanel_layout)
 
         self.setLayout(self.main_layout)
 
+        # filter lists follow the value sets
+        self.appState.subscribe(self.ValueSetChanged)
+
 
     # FUNCTIONS
 
+    def ValueSetChanged(self, field, value, added):
+        # adding/removing one option of the filter list of the field, lists stay sorted
+        col = LIST_FIELDS.get(field)
+        if col is None:
+            return
+        list_widget = self.list_widget[col]
+        items = [list_widget.item(i).text() for i in range(list_widget.count())]
+        index = bisect_left(items, value)
+        found = index < len(items) and items[index] == value
+        if added and not found:
+            list_widget.insertItem(index, value)
+        elif not added and found:
+            list_widget.takeItem(index)
+
+
     def SetResultType(self, result_type):
         """
         Update the result type and call the SaveGraph function.
@@ -160,172 +313,84 @@ class TestsWindow(QWidget):
     def FilterButtonPushed(self):
         
         self.saved_data = []
-        filtered_data = []
-
-        # Collect selected filters from the list widgets
-        for items in self.list_widget[:6]:
-            selected_items = [item.text() for item in items.selectedItems()]
-            filtered_data.append(selected_items)
-
 
-        # Use default values if no filters are selected
-        filtered_data = [data if data else ['default'] for data in filtered_data]
+        # Collect selected filters from the list widgets (no selection -> all values)
+        selections = {}
+        for key, items in zip(["bacteria", "stressor", "concentration", "time", "blank", "repetition"], self.list_widget[:6]):
+            selections[key] = [item.text() for item in items.selectedItems()]
+        selections["blank"] = [value == "Yes" for value in selections["blank"]]
 
-        parameter_combinations = list(product(*filtered_data))
-
-        # Store results of filtering
-        results = []
+        selected_carbon_sources = [item.text() for item in self.list_widget[6].selectedItems()]
+        selected_carbon_groups = [item.text() for item in self.list_widget[7].selectedItems()]
 
-        for combination in parameter_combinations:
-            criteria = {
-                "bacteria": combination[0],
-                "stressor": combination[1],
-                "concentration": combination[2],
-                "time": combination[3],
-                "blank": combination[4],
-                "repetition": combination[5],
-            }
-            
-            
-            matching_records = None
-            for key, value in criteria.items():
-                if value == "default":  # Include all records for this criterion
-                    candidates = set()
-                    for records in self.records_dicts[key].values():
-                        candidates.update(records)
-                else:
-                    candidates = set(self.records_dicts[key].get(value, []))
-                
-        
-                if not candidates:  # Skip empty candidate sets to avoid premature filtering
-                    continue
+        if selected_carbon_sources and selected_carbon_groups:
+            self.ClearDisplayPanel()
+            QMessageBox.warning(self, "ERROR", "You can filter by carbon sources OR carbon sources groups.")
+            return
 
-                if matching_records is None:
-                    matching_records = candidates
-                else:
-                    matching_records.intersection_update(candidates)
-                
-                if not matching_records:  # If intersection is empty, break early
-                    break
+        # results of filtering (bitmap index query) and a copy of their plates taken here, their values gathered
+        # in the background; a new filter supersedes a running one
+        inputs = workers.filter_inputs(self.appState, selections, selected_carbon_sources, selected_carbon_groups)
+        self.job_progress.submit("filter", workers.filter_job, *inputs, finished=self.ShowFilterResults)
 
-            # Only add non-empty results
-            if matching_records:
-                results.extend(matching_records)
 
+    def ShowFilterResults(self, filtered):
+        """
+        Display and save the filtered data: full matrix without carbon source, otherwise the selected wells.
+        """
+        results, values, mode, labels = filtered
 
         # After filtering, warn if no results were found
         if not results:
             QMessageBox.warning(self, "No Results", "No records match the selected filters.")
 
         # Clear previous display panel
-        for i in reversed(range(self.displayPanel_layout.count())):
-            self.displayPanel_layout.itemAt(i).widget().deleteLater()
+        self.ClearDisplayPanel()
 
-        selected_carbon_sources = [item.text() for item in self.list_widget[6].selectedItems()]
-        selected_carbon_groups = [item.text() for item in self.list_widget[7].selectedItems()]
+        model = self.records_view.results_model
+        model.setResults(results, values, mode, labels)
+        self.displayPanel_layout.addWidget(self.records_view)
+        self.records_view.show()
 
-        # Display and save filtered data based on the filters
-        for record in results:
-            if not selected_carbon_sources and not selected_carbon_groups:
-                matrix = getattr(record, "ecoplate", [[0] * 4 for _ in range(8)])
-                record_widget = RecordWidget(record, matrix, 0)
-                self.displayPanel_layout.addWidget(record_widget)
-                self.saved_data.append((record, matrix))
-
-            elif selected_carbon_sources and not selected_carbon_groups:
-                coords = []
-                for selected_source in selected_carbon_sources:
-                    for row_idx, row in enumerate(self.carbon_sources):
-                        if selected_source in row:
-                            col_idx = row.index(selected_source)
-                            coords.append((selected_source, row_idx, col_idx))
-
-                matrix = []
-                for (selected_source, row_idx, col_idx) in coords:
-                    value = record.ecoplate[row_idx][col_idx]
-                    matrix.append([selected_source, value])
-
-                record_widget = RecordWidget(record, matrix, 1)
-                self.displayPanel_layout.addWidget(record_widget)
-                self.saved_data.append((record, matrix))
-
-            elif selected_carbon_groups and not selected_carbon_sources:
-                coords = []
-                for group in selected_carbon_groups:
-                    if group in self.carbon_sources_groups:
-                        group_sources = self.carbon_sources_groups[group]
-                        for source in group_sources:
-                            for row_idx, row in enumerate(self.carbon_sources):
-                                if source in row:
-                                    col_idx = row.index(source)
-                                    coords.append((group, source, row_idx, col_idx))
-
-                matrix = []
-                for (group, source, row_idx, col_idx) in coords:
-                    value = record.ecoplate[row_idx][col_idx]
-                    matrix.append([group, source, value])
-
-                record_widget = RecordWidget(record, matrix, 2)
-                self.displayPanel_layout.addWidget(record_widget)
-                self.saved_data.append((record, matrix))
-
-            elif selected_carbon_sources and selected_carbon_groups:
-                QMessageBox.warning(self, "ERROR", "You can filter by carbon sources OR carbon sources groups.")
+        self.saved_data = [(record, model.matrix(index)) for index, record in enumerate(results)]        # for csv saving
 
 
     def ShowTestResults(self, results, result_type):
         """
-        A function for showcasing various test results such as AWCD, SAWCD, Shannon Index, and Shannon Evenness.
+        A function for showcasing various test results such as AWCD, SAWCD, Shannon Index, Shannon Evenness and other indices.
         
         :param results: The results to be displayed (list of tuples, each containing a record and a value).
         :param result_type: A string specifying the type of result (e.g., 'AWCD', 'SAWCD', 'Shannon Index', etc.).
         """
 
         # Clear the previous display panel
-        for i in reversed(range(self.displayPanel_layout.count())):
-            self.displayPanel_layout.itemAt(i).widget().deleteLater()
+        self.ClearDisplayPanel()
 
-        # Create a table widget
-        table = QTableWidget()
-        
-        if result_type == 'AWCD':
-            table.setColumnCount(6)
-            table.setHorizontalHeaderLabels(["Bacteria", "Stressor", "Concentration", "Time", "Repetition", "AWCD"])
-        elif result_type == 'SAWCD':
-            table.setColumnCount(7)
-            table.setHorizontalHeaderLabels(["Bacteria", "Stressor", "Concentration", "Time", "Repetition", "Category", "SAWCD"])
-        elif result_type == 'Shannon Index':
-            table.setColumnCount(6)
-            table.setHorizontalHeaderLabels(["Bacteria", "Stressor", "Concentration", "Time", "Repetition", "Shannon Index"])
-        elif result_type == 'Shannon Evenness':
-            table.setColumnCount(6)
-            table.setHorizontalHeaderLabels(["Bacteria", "Stressor", "Concentration", "Time", "Repetition", "Shannon Evenness"])
-        else:
-            raise ValueError(f"Unknown result type: {result_type}")
+        records = [record for record, _ in results]
+        headers = ["Bacteria", "Stressor", "Concentration", "Time", "Repetition"]
+        columns = [[getattr(record, field) for record in records] for field in ("bacteria", "stressor", "concentration", "time", "repetition")]
 
-        # Set row count based on the number of results
-        table.setRowCount(len(results))
+        if result_type == 'SAWCD':
+            headers += ["Category", "SAWCD"]
+            columns += [[group for _, (group, _) in results], [value for _, (_, value) in results]]
+        else:
+            headers.append(result_type)
+            columns.append([value for _, value in results])     # richness (well count) stays integer
 
-        # Populate the table with the results
-        for row_idx, (record, value) in enumerate(results):
-            table.setItem(row_idx, 0, QTableWidgetItem(record.bacteria))
-            table.setItem(row_idx, 1, QTableWidgetItem(record.stressor))
-            table.setItem(row_idx, 2, QTableWidgetItem(record.concentration))
-            table.setItem(row_idx, 3, QTableWidgetItem(record.time))
-            table.setItem(row_idx, 4, QTableWidgetItem(record.repetition))
+        # Swap the results into the table model, cells are formatted when painted
+        self.results_view.results_model.setResults(headers, columns)
+        self.displayPanel_layout.addWidget(self.results_view)
+        self.results_view.show()
 
-            if result_type == 'AWCD':
-                table.setItem(row_idx, 5, QTableWidgetItem(f"{value:.3f}"))
-            elif result_type == 'SAWCD':
-                table.setItem(row_idx, 5, QTableWidgetItem(value[0]))  # Category
-                table.setItem(row_idx, 6, QTableWidgetItem(f"{value[1]:.3f}"))  # SAWCD
-            elif result_type == 'Shannon Index':
-                table.setItem(row_idx, 5, QTableWidgetItem(f"{value:.3f}"))
-            elif result_type == 'Shannon Evenness':
-                table.setItem(row_idx, 5, QTableWidgetItem(f"{value:.3f}"))
 
-        # Add the table to the display panel
-        self.displayPanel_layout.addWidget(table)
+    def ClearDisplayPanel(self):
+        """
+        Take the records list and the results table out of the display panel and hide them.
+        """
+        for i in reversed(range(self.displayPanel_layout.count())):
+            widget = self.displayPanel_layout.itemAt(i).widget()
+            self.displayPanel_layout.removeWidget(widget)
+            widget.hide()
 
 
     def SaveResultsToCSV(self):
@@ -346,308 +411,475 @@ class TestsWindow(QWidget):
             return  # User canceled the save dialog
 
         # Determine if filtering by carbon sources or groups
-        is_filtering_by_carbon_sources = bool([item.text() for item in self.list_widget[6].selectedItems()])
-        is_filtering_by_carbon_groups = bool([item.text() for item in self.list_widget[7].selectedItems()])
-
-        try:
-            with open(file_path, mode='w', newline='', encoding='utf-8') as csv_file:
-                writer = csv.writer(csv_file)
-
-                # Construct the header based on filtering criteria
-                if is_filtering_by_carbon_sources:
-                    header = ["Bacteria", "Stressor", "Concentration", "Time", "Repetition", "Blank", "Carbon Source", "SAWCD"]
-                elif is_filtering_by_carbon_groups:
-                    header = ["Bacteria", "Stressor", "Concentration", "Time", "Repetition", "Blank", "Carbon Source Group", "SAWCD"]
-                else:
-                    header = ["Bacteria", "Stressor", "Concentration", "Time", "Repetition", "Blank", "AWCD", "Shannon Index", "Shannon Evenness"]
-                
-                writer.writerow(header)
-
-                # Write data rows
-                for record, matrix in self.saved_data:
-                    common_data = [
-                        record.bacteria,
-                        record.stressor,
-                        record.concentration,
-                        record.time,
-                        record.repetition,
-                        record.blank,
-                    ]
-
-                    if is_filtering_by_carbon_sources:
-                        sawcd_results = self.CalculateSAWCD()  # Get the SAWCD results
-                        for group, sawcd in sawcd_results:
-                            group_name = group 
-                            sawcd_value = sawcd 
-                            writer.writerow(common_data + [group_name, sawcd_value])
-                    
-                    elif is_filtering_by_carbon_groups:
-                        sawcd_results = self.CalculateSAWCD()  # Get the SAWCD results
-                        for record_result, (group, sawcd) in sawcd_results:
-                            if record_result == record:
-                                group_name = group  
-                                sawcd_value = sawcd 
-                                writer.writerow(common_data + [group_name, sawcd_value])
-                    
-                    else:
-                        # Calculate and retrieve AWCD, Shannon Index, and Shannon Evenness values
-                        awcd_results = self.CalculateAWCD()
-                        shannon_index_results = self.CalculateShannonIndex()  # Get the Shannon Index
-                        shannon_evenness_results = self.CalculateShannonEvenness()  # Get the Shannon Evenness
-
-                        # match calculated values to the record
-                        awcd = next((result[1] for result in awcd_results if result[0] == record), "N/A")
-                        shannon_index = next((result[1] for result in shannon_index_results if result[0] == record), "N/A")
-                        shannon_evenness = next((result[1] for result in shannon_evenness_results if result[0] == record), "N/A")
-
-                        writer.writerow(common_data + [awcd, shannon_index, shannon_evenness])
-
-            QMessageBox.information(self, "Success", f"Results successfully saved to {file_path}.")
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"An error occurred while saving the file:\n{e}")
-
-
-    def CalculateAWCD(self):
-        """
-        A function to calculate AWCD for the saved data and display the results.
-        Returns a list of tuples with the original record and the AWCD value.
-        """
-
-        if not self.saved_data:
-            QMessageBox.warning(self, "No Data", "Please filter the data first before calculating AWCD.")
-            return []
-        
-        # If there are selected carbon sources or groups, don't proceed
         selected_carbon_sources = [item.text() for item in self.list_widget[6].selectedItems()]
         selected_carbon_groups = [item.text() for item in self.list_widget[7].selectedItems()]
-        if selected_carbon_sources or selected_carbon_groups:
-            QMessageBox.warning(self, "Invalid Selection", "Please do not select any carbon source or carbon source group when calculating AWCD.")
-            return [] 
 
-        awcd_results = []  # Store the AWCD results for each record
+        # every requested metric of all saved records computed once in the background (or taken from the metric cache):
+        # one table row per record
+        records = [record for record, _ in self.saved_data]
+        if selected_carbon_sources:
+            # a carbon source is a group of one well
+            names = selected_carbon_sources
+        elif selected_carbon_groups:
+            names = [group for group in selected_carbon_groups if group in self.carbon_sources_groups]
+        else:
+            names = None
+
+        # Construct the header based on filtering criteria
+        if selected_carbon_sources:
+            header = ["Bacteria", "Stressor", "Concentration", "Time", "Repetition", "Blank", "Carbon Source", "SAWCD"]
+        elif selected_carbon_groups:
+            header = ["Bacteria", "Stressor", "Concentration", "Time", "Repetition", "Blank", "Carbon Source Group", "SAWCD"]
+        else:
+            metric_names = metrics.community_names(self.richness_threshold.value())
+            header = ["Bacteria", "Stressor", "Concentration", "Time", "Repetition", "Blank"] + metric_names
+
+        common_data = [[record.bacteria, record.stressor, record.concentration, record.time, record.repetition, record.blank]
+                       for record in records]
+
+        def write(tables, _):
+            if names is not None:
+                table = zip(*[group_table["SAWCD"] for group_table in tables])
+            else:
+                table = zip(*tables[0].values())
 
-        for record, matrix in self.saved_data:
-            awcd = 0
-            total_wells = 0
-            first_value_skipped = False  # To skip the first value (water well)
+            try:
+                with open(file_path, mode='w', newline='', encoding='utf-8') as csv_file:
+                    writer = csv.writer(csv_file)
+                    writer.writerow(header)
 
-            for row in matrix:
-                if isinstance(row, list): 
-                    for value in row:
-                        try:
-                            value = float(value)
+                    # Write data rows, streamed from the table
+                    for info, table_row in zip(common_data, table):
+                        if names is not None:
+                            writer.writerows(info + [name, value] for name, value in zip(names, table_row))
+                        else:
+                            writer.writerow(info + list(table_row))
 
-                            # Skip the first value (water well)
-                            if not first_value_skipped:
-                                first_value_skipped = True
-                                continue
+                QMessageBox.information(self, "Success", f"Results successfully saved to {file_path}.")
+
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"An error occurred while saving the file:\n{e}")
+
+        if names is not None:
+            request = self.RequestMetrics(records, ["SAWCD"], names)
+        else:
+            request = self.RequestMetrics(records, metric_names, [None])
+        self.RunMetrics("results", request, write)
 
-                            awcd += value
-                            total_wells += 1
-                        except ValueError:
-                            pass
 
-            if total_wells > 0:
-                awcd /= total_wells
+    def WellInputs(self, records, blank_corrected=None):
+        """Copy of the plates of the records and, blank corrected (when the checkbox is checked or blank_corrected),
+        of the blank correction inputs; taken in the GUI thread for background jobs (blank_correction.well_values)"""
+        if blank_corrected is None:
+            blank_corrected = self.blank_checkbox.isChecked()
+        if blank_corrected:
+            return blank_correction.blank_inputs(self.appState, records)
+        return self.appState.take_plates(records), None
 
-            awcd_results.append((record, awcd))
 
-        self.ShowTestResults(awcd_results, 'AWCD')
+    def RequestMetrics(self, records, names, groups, blank_corrected=None, threshold=None):
+        """MetricRequest of metrics of the records for every group (None: whole-plate metrics,
+        otherwise SAWCD of a carbon group or a single carbon source).
+        Blank correction and richness threshold are read from the widgets unless given."""
+        if blank_corrected is None:
+            blank_corrected = self.blank_checkbox.isChecked()
+        if threshold is None:
+            threshold = self.richness_threshold.value()
+        return MetricRequest(self.appState, records, names, groups, blank_corrected, threshold)
 
-        return awcd_results
 
+    def RunMetrics(self, name, request, finished, then=None):
+        """Compute a MetricRequest in a background job of the name, then(tables) runs in the job too (aggregation);
+        the computed values are cached and finished(tables, result of then) is called in the GUI thread"""
+        def compute(job):
+            tables = request.compute(job)
+            return tables, then(tables) if then is not None else None
 
-    def CalculateSAWCD(self):
+        def done(result):
+            request.cache(self.appState)
+            finished(*result)
+
+        self.job_progress.submit(name, compute, finished=done)
+
+
+    def TestRequest(self, result_type):
         """
-        A function to calculate SAWCD for the saved data and showcase the results.
+        Records, metric and carbon groups of a test of the saved data (whole-plate metrics: one None group);
+        None after a warning if the selection does not allow the test.
         """
         if not self.saved_data:
-            QMessageBox.warning(self, "No Data", "Please filter the data first before calculating SAWCD.")
-            return []
-        
-        selected_carbon_sources = [item.text() for item in self.list_widget[6].selectedItems()]
-        if selected_carbon_sources:
-            QMessageBox.warning(self, "Invalid Selection", "Please do not select any carbon source when calculating SAWCD.")
-            return []  
+            QMessageBox.warning(self, "No Data", f"Please filter the data first before calculating {result_type}.")
+            return None
 
-        # Get selected categories from the filters
+        selected_carbon_sources = [item.text() for item in self.list_widget[6].selectedItems()]
         selected_carbon_groups = [item.text() for item in self.list_widget[7].selectedItems()]
-        if not selected_carbon_groups:
-            QMessageBox.warning(self, "No Category Selected", "Please select at least one substrate category.")
-            return []
-        
+        records = [record for record, _ in self.saved_data]
+
+        if result_type == "SAWCD":
+            if selected_carbon_sources:
+                QMessageBox.warning(self, "Invalid Selection", "Please do not select any carbon source when calculating SAWCD.")
+                return None
+            if not selected_carbon_groups:
+                QMessageBox.warning(self, "No Category Selected", "Please select at least one substrate category.")
+                return None
+            # SAWCD of all records, group by group
+            return records, "SAWCD", [group for group in selected_carbon_groups if group in self.carbon_sources_groups]
+
+        # If there are selected carbon sources or groups, don't proceed
+        if selected_carbon_sources or selected_carbon_groups:
+            QMessageBox.warning(self, "Invalid Selection", f"Please do not select any carbon source or carbon source group when calculating {result_type}.")
+            return None
+
+        metric = metrics.richness_name(self.richness_threshold.value()) if result_type == "Richness" else result_type
+        return records, metric, [None]
+
+
+
+
+    def TestResults(self, records, metric, groups, values):
+        """
+        List of tuples with the original record and the value, SAWCD: the record and (group, value) record by record.
+        """
+        if metric != "SAWCD":
+            return list(zip(records, values[0]))
 
         sawcd_results = []
-        for record, matrix in self.saved_data:
-            # For each selected carbon group
-            for group in selected_carbon_groups:
-                sawcd = 0
-                total_wells = 0
+        for index, record in enumerate(records):
+            for group, group_values in zip(groups, values):
+                sawcd_results.append((record, (group, group_values[index])))
+        return sawcd_results
 
-                # Calculate SAWCD for the current group
-                if group in self.carbon_sources_groups:
-                    group_sources = self.carbon_sources_groups[group]
 
-                    for source in group_sources:
-                        found = False
-                        for matrix_row in matrix:
-                            if len(matrix_row) >= 3 and matrix_row[1] == source:
-                                try:
-                                    value = float(matrix_row[2])
-                                    if value < 0:
-                                        value = 0  
-                                    sawcd += value
-                                    total_wells += 1
-                                    found = True
-                                    break
-                                except (ValueError, IndexError):
-                                    pass
 
-                # Calculate the average for the selected category
-                if total_wells > 0:
-                    sawcd /= total_wells
 
-                # Append the result as a tuple of the record and the calculated SAWCD
-                sawcd_results.append((record, (group, sawcd)))
+    def RunTest(self, result_type):
+        """
+        Calculate a test for the saved data in the background and showcase the results when done;
+        a newer test supersedes a running one.
+        """
+        self.SetResultType(result_type)
+        request = self.TestRequest(result_type)
+        if request is None:
+            return
+
+        records, metric, groups = request
+
+        def show(tables, _):
+            results = self.TestResults(records, metric, groups, [table[metric] for table in tables])
+            if results:
+                self.ShowTestResults(results, metric)
 
-            self.ShowTestResults(sawcd_results, 'SAWCD')
+        self.RunMetrics("test", self.RequestMetrics(records, [metric], groups), show)
 
-        return sawcd_results  # Return the results
 
+    def SummaryKeys(self, metric, records, groups):
+        """Key columns of the summary of a test in the order of the test values: (concentration, time),
+        SAWCD (concentration, time, group) record by record and group by group;
+        blank records form a separate "Blank" concentration except for SAWCD"""
+        if metric == "SAWCD":
+            return [[record.concentration for record in records for _ in groups],
+                    [record.time for record in records for _ in groups],
+                    [group for _ in records for group in groups]]
+        return [["Blank" if record.blank else record.concentration for record in records],
+                [record.time for record in records]]
 
-    def CalculateShannonIndex(self):
+
+    def RunSummary(self, name, request, finished):
         """
-        A function to calculate Shannon Index for the saved data and showcase the results.
-        Returns a list of tuples with the original record and the Shannon Index value.
+        Compute a test request (TestRequest) and its count, sum, mean, SD and SEM per summary key in a background job;
+        finished(keys, stats) is called in the GUI thread.
+        """
+        records, metric, groups = request
+        columns = self.SummaryKeys(metric, records, groups)
+        self.RunMetrics(name, self.RequestMetrics(records, [metric], groups),
+                        lambda _, summary: finished(*summary),
+                        then=lambda tables: aggregation.aggregate(test_values(tables, metric), columns))
+
+
+    def RichnessSweep(self):
+        """
+        Richness of the saved data at OD thresholds 0.10 - 0.50 (step 0.05), computed for all records and thresholds at once
+        in the background. Saves the tidy table (one row per record and threshold) to a .csv file
+        and a plot of the mean richness per concentration and time next to it (.png).
         """
-        # Check if the saved data is populated
         if not self.saved_data:
-            QMessageBox.warning(self, "No Data", "Please filter the data first before calculating Shannon Index.")
-            return []  
-        
+            QMessageBox.warning(self, "No Data", "Please filter the data first before the richness sweep.")
+            return
+
         selected_carbon_sources = [item.text() for item in self.list_widget[6].selectedItems()]
         selected_carbon_groups = [item.text() for item in self.list_widget[7].selectedItems()]
         if selected_carbon_sources or selected_carbon_groups:
-            QMessageBox.warning(self, "Invalid Selection", "Please do not select any carbon source or carbon source group when calculating Shannon Index.")
-            return [] 
-
-        shannon_index_results = []  # List to store the results
-
-        for record, matrix in self.saved_data:
-            # Check if matrix is valid (a list of lists) and contains numeric values
-            if not isinstance(matrix, list):
-                QMessageBox.warning(self, "Invalid Data", f"Invalid data format for record {record}. Skipping this record.")
-                continue
-            
-            total_development = 0.0
-            valid_values = []  # List to store valid values (positive values from the matrix)
-            first_value_skipped = False  # Flag to skip the first value (water)
-
-
-            for row in matrix:
-                if isinstance(row, list):  
-                    for value in row:
-                        try:
-                            value = float(value)  
-
-                            if not first_value_skipped:
-                                first_value_skipped = True
-                                continue  # Skip the first value (water)
-                            
-                            if value > 0: 
-                                valid_values.append(value)
-                                total_development += value
-                        except ValueError:
-                            pass  
-
-            # Ensure that there are valid values to calculate Shannon Index
-            if total_development > 0:
-                proportions = [val / total_development for val in valid_values]
-                shannon_index = -sum(p * math.log(p) for p in proportions if p > 0)
-            else:
-                shannon_index = 0.0  # If no valid values, set Shannon Index to 0
+            QMessageBox.warning(self, "Invalid Selection", "Please do not select any carbon source or carbon source group for the richness sweep.")
+            return
+
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Richness Sweep to CSV", "", "CSV Files (*.csv);;All Files (*)")
+        if not file_path:
+            return  # User canceled the save dialog
 
-            shannon_index_results.append((record, shannon_index))
+        records = [record for record, _ in self.saved_data]
+        thresholds = metrics.SWEEP_THRESHOLDS
+        graph_path = os.path.splitext(file_path)[0] + ".png"
+        inputs = self.WellInputs(records)
+        infos = [[record.bacteria, record.stressor, record.concentration, record.time, record.repetition, record.blank]
+                 for record in records]
+
+        def sweep(job):
+            record_index, threshold_column, richness_column = metrics.tidy_sweep(
+                metrics.richness_sweep(blank_correction.well_values(*inputs), thresholds), thresholds)
+            job.check()
+
+            # mean richness per (concentration, time) and threshold, blanks are a separate "Blank" concentration
+            concentrations = ["Blank" if info[5] else info[2] for info in infos]
+            keys, stats = aggregation.aggregate(richness_column, [[concentrations[index] for index in record_index.tolist()],
+                                                                  [infos[index][3] for index in record_index.tolist()],
+                                                                  threshold_column])
+            return record_index, threshold_column, richness_column, keys, stats
+
+        def save(result):
+            record_index, threshold_column, richness_column, keys, stats = result
+            try:
+                with open(file_path, mode='w', newline='', encoding='utf-8') as csv_file:
+                    writer = csv.writer(csv_file)
+                    writer.writerow(["Bacteria", "Stressor", "Concentration", "Time", "Repetition", "Blank", "Threshold", "Richness"])
+                    for index, threshold, richness in zip(record_index.tolist(), threshold_column.tolist(), richness_column.tolist()):
+                        writer.writerow(infos[index] + [threshold, richness])
+
+                lines = {}
+                for (conc, time, threshold), mean, sem in zip(keys, stats["mean"], np.nan_to_num(stats["sem"])):
+                    lines.setdefault((conc, time), []).append((threshold, mean, sem))
+
+                fig, ax = plt.subplots(figsize=(12, 8))
+                for (conc, time), points in sorted(lines.items()):
+                    points.sort()
+                    ax.errorbar([point[0] for point in points], [point[1] for point in points], yerr=[point[2] for point in points],
+                                marker="o", capsize=3, label=f"{conc} ppm, {time} h" if conc != "Blank" else f"Blank, {time} h")
+                ax.set_xlabel("OD threshold")
+                ax.set_ylabel("Richness [utilized substrates]")
+                ax.set_title("Richness threshold sweep")
+                ax.set_xticks(thresholds)
+                ax.legend(title="Concentration, time", bbox_to_anchor=(1.05, 1), loc='upper left')
+                plt.tight_layout()
+                plt.savefig(graph_path, format="png", bbox_inches="tight")
+                plt.close(fig)
 
-        if shannon_index_results:
-            self.ShowTestResults(shannon_index_results, 'Shannon Index')
+                QMessageBox.information(self, "Success", f"Richness sweep saved to {file_path} and {graph_path}.")
 
-        return shannon_index_results
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"An error occurred while saving the file:\n{e}")
 
+        self.job_progress.submit("sweep", sweep, finished=save)
 
 
-    def CalculateShannonEvenness(self):
+    def PCARecords(self):
         """
-        A function to calculate Shannon Evenness for the saved data and showcase the results.
-        Returns a list of tuples with the original record and the Shannon Evenness value.
+        Records of the saved data for the PCA; None after a warning if the selection does not allow it.
+        """
+        if len(self.saved_data) < 2:
+            QMessageBox.warning(self, "No Data", "Please filter at least 2 records before the PCA.")
+            return None
+
+        selected_carbon_sources = [item.text() for item in self.list_widget[6].selectedItems()]
+        selected_carbon_groups = [item.text() for item in self.list_widget[7].selectedItems()]
+        if selected_carbon_sources or selected_carbon_groups:
+            QMessageBox.warning(self, "Invalid Selection", "Please do not select any carbon source or carbon source group for the PCA.")
+            return None
+
+        return [record for record, _ in self.saved_data]
+
+
+    def RunPCA(self, name, records, finished):
+        """
+        PCA model of the records (exact or randomized SVD by the number of records) fitted in a background job of the name,
+        finished(model) is called in the GUI thread.
+        The model is reused while the saved records and the blank correction stay the same.
+        """
+        key = (tuple(record.row for record in records), self.blank_checkbox.isChecked())
+        if key == self.pca_key:
+            finished(self.pca_model)
+            return
+
+        def fitted(model):
+            self.pca_model = model
+            self.pca_key = key
+            finished(model)
+
+        inputs = self.WellInputs(records)
+        self.job_progress.submit(name, lambda job: pca.PCAModel(blank_correction.well_values(*inputs), metrics.WATER_MASK).fit(PCA_COMPONENTS),
+                                 finished=fitted)
+
+
+    def SavePCAGraph(self):
+        """
+        Save a scatter plot of the first two principal components of the saved data, coloured by the chosen field.
+        """
+        records = self.PCARecords()
+        if records is None:
+            return
+
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Graph", "", "PNG files (*.png);;PDF files (*.pdf)")
+        if not file_name:
+            return
+        field = self.pca_colour.currentText()
+
+        def plot(model):
+            if model.scores.shape[1] < 2:
+                QMessageBox.warning(self, "No Data", "Not enough complete records for the PCA.")
+                return
+
+            labels = [getattr(records[row], field) for row in model.rows.tolist()]
+
+            fig, ax = plt.subplots(figsize=(12, 8))
+            color_map = plt.get_cmap("tab10")
+            for idx, label in enumerate(sorted(set(labels))):
+                selected = np.array([value == label for value in labels])
+                ax.scatter(model.scores[selected, 0], model.scores[selected, 1], s=20,
+                           color=color_map(idx % 10), label=label)
+
+            ax.set_xlabel(f"PC1 ({model.explained[0] * 100:.1f} %)")
+            ax.set_ylabel(f"PC2 ({model.explained[1] * 100:.1f} %)")
+            ax.set_title(f"PCA of substrate profiles ({len(model.rows)} records, {model.method} SVD)")
+            ax.legend(title=field, bbox_to_anchor=(1.05, 1), loc='upper left')
+
+            plt.tight_layout()
+            plt.savefig(file_name, format="png" if file_name.endswith(".png") else "pdf", bbox_inches="tight")
+            QMessageBox.information(self, "Graph Saved", f"Graph has been saved to {file_name}.")
+            plt.close(fig)
+
+        self.RunPCA("pca graph", records, plot)
+
+
+    def SavePCAToCSV(self):
+        """
+        Save the PCA scores of the saved data to a .csv file and the loadings with the explained variance next to it (_loadings.csv).
+        """
+        records = self.PCARecords()
+        if records is None:
+            return
+
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save PCA to CSV", "", "CSV Files (*.csv);;All Files (*)")
+        if not file_path:
+            return  # User canceled the save dialog
+        loadings_path = os.path.splitext(file_path)[0] + "_loadings.csv"
+
+        def write(model):
+            components = [f"PC{index + 1}" for index in range(model.scores.shape[1])]
+            substrates = [name for name, water in zip((name for row in self.carbon_sources for name in row), model.water_mask) if not water]
+
+            try:
+                with open(file_path, mode='w', newline='', encoding='utf-8') as csv_file:
+                    writer = csv.writer(csv_file)
+                    writer.writerow(["Bacteria", "Stressor", "Concentration", "Time", "Repetition", "Blank"] + components)
+                    for row, scores in zip(model.rows.tolist(), model.scores.tolist()):
+                        record = records[row]
+                        writer.writerow([record.bacteria, record.stressor, record.concentration, record.time,
+                                         record.repetition, record.blank] + scores)
+
+                with open(loadings_path, mode='w', newline='', encoding='utf-8') as csv_file:
+                    writer = csv.writer(csv_file)
+                    writer.writerow(["Carbon Source"] + components)
+                    for substrate, loadings in zip(substrates, model.loadings.tolist()):
+                        writer.writerow([substrate] + loadings)
+                    writer.writerow(["Explained Variance"] + model.explained.tolist())
+
+                QMessageBox.information(self, "Success", f"PCA saved to {file_path} and {loadings_path}.")
+
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"An error occurred while saving the file:\n{e}")
+
+        self.RunPCA("pca csv", records, write)
+
+
+    def SaveBootstrapToCSV(self):
+        """
+        Save bootstrap 95 % confidence intervals of AWCD and the Shannon index of the saved data
+        per stressor, concentration and time to a .csv file (10000 resamples of repetitions and wells, fixed seed);
+        the intervals are computed in the background.
         """
-        # Check if the saved data is populated
         if not self.saved_data:
-            QMessageBox.warning(self, "No Data", "Please filter the data first before calculating Shannon Evenness.")
-            return [] 
-        
+            QMessageBox.warning(self, "No Data", "Please filter the data first before the bootstrap.")
+            return
+
         selected_carbon_sources = [item.text() for item in self.list_widget[6].selectedItems()]
         selected_carbon_groups = [item.text() for item in self.list_widget[7].selectedItems()]
         if selected_carbon_sources or selected_carbon_groups:
-            QMessageBox.warning(self, "Invalid Selection", "Please do not select any carbon source or carbon source group when calculating Shannon Evenness.")
-            return []
-
-        shannon_evenness_results = []  # List to store the results
-
-        for record, matrix in self.saved_data:
-            # Check if matrix is valid (a list of lists) and contains numeric values
-            if not isinstance(matrix, list):
-                QMessageBox.warning(self, "Invalid Data", f"Invalid data format for record {record}. Skipping this record.")
-                continue
-
-            total_development = 0.0
-            valid_values = []  # List to store valid values (positive values from the matrix)
-            first_value_skipped = False  # Flag to skip the first value (water))
-
-
-            for row in matrix:
-                if isinstance(row, list):  
-                    for value in row:
-                        try:
-                            value = float(value)  
-
-                            if not first_value_skipped:
-                                first_value_skipped = True
-                                continue  # Skip the first value (water)
-                            
-                            if value > 0:  
-                                valid_values.append(value)
-                                total_development += value
-                        except ValueError:
-                            pass  
-
-            # Ensure that there are valid values to calculate Shannon Evenness
-            if total_development > 0:
-                proportions = [val / total_development for val in valid_values]
-                shannon_index = -sum(p * math.log(p) for p in proportions if p > 0)
-            else:
-                shannon_index = 0.0  # If no valid values, set Shannon Index to 0
+            QMessageBox.warning(self, "Invalid Selection", "Please do not select any carbon source or carbon source group for the bootstrap.")
+            return
 
-            # Calculate the Shannon Evenness
-            S = len(valid_values)
-            if S > 0:
-                shannon_evenness = shannon_index / math.log(S)
-            else:
-                shannon_evenness = 0.0  # No evenness if no valid values are present
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Bootstrap CI to CSV", "", "CSV Files (*.csv);;All Files (*)")
+        if not file_path:
+            return  # User canceled the save dialog
+
+        records = [record for record, _ in self.saved_data]
+        columns = [[getattr(record, field) for record in records] for field in ("stressor", "concentration", "time")]
+        inputs = self.WellInputs(records)
+
+        header = ["Stressor", "Concentration", "Time", "Count"]
+        for metric in bootstrap.METRICS:
+            header += [metric, f"{metric} CI low", f"{metric} CI high"]
+
+        def write(result):
+            keys, counts, point, intervals = result
+            try:
+                with open(file_path, mode='w', newline='', encoding='utf-8') as csv_file:
+                    writer = csv.writer(csv_file)
+                    writer.writerow(header)
+                    for key, count, estimates, bounds in zip(keys, counts.tolist(), point.tolist(), intervals.tolist()):
+                        row = list(key) + [count]
+                        for estimate, (low, high) in zip(estimates, bounds):
+                            row += [estimate, low, high]
+                        writer.writerow(row)
 
-            shannon_evenness_results.append((record, shannon_evenness))
+                QMessageBox.information(self, "Success", f"Bootstrap confidence intervals saved to {file_path}.")
 
-        if shannon_evenness_results:
-            self.ShowTestResults(shannon_evenness_results, 'Shannon Evenness')
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"An error occurred while saving the file:\n{e}")
 
-        return shannon_evenness_results
+        self.job_progress.submit("bootstrap", lambda job: bootstrap.bootstrap(blank_correction.well_values(*inputs), columns, check=job.check),
+                                 finished=write)
+
+
+    def SaveSummaryToCSV(self):
+        """
+        Save count, mean, SD and SEM of the last calculated test per concentration and time to a .csv file;
+        the test and its summary are computed in the background.
+        """
+        if not self.saved_data:
+            QMessageBox.warning(self, "No Data", "Please filter or calculate data before saving.")
+            return
+
+        result_type = self.result_type
+        request = self.TestRequest(result_type)
+        if request is None:
+            return
+
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Summary to CSV", "", "CSV Files (*.csv);;All Files (*)")
+        if not file_path:
+            return  # User canceled the save dialog
+
+        key_names = ["Concentration", "Time", "Carbon Source Group"] if result_type == "SAWCD" else ["Concentration", "Time"]
+
+        def write(keys, stats):
+            try:
+                with open(file_path, mode='w', newline='', encoding='utf-8') as csv_file:
+                    writer = csv.writer(csv_file)
+                    writer.writerow(["Test"] + key_names + ["Count", "Mean", "SD", "SEM"])
+                    for key, count, mean, sd, sem in zip(keys, stats["count"].tolist(), stats["mean"].tolist(),
+                                                         stats["sd"].tolist(), stats["sem"].tolist()):
+                        writer.writerow([result_type] + list(key) + [count, mean, sd, sem])
+
+                QMessageBox.information(self, "Success", f"Summary successfully saved to {file_path}.")
+
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"An error occurred while saving the file:\n{e}")
+
+        self.RunSummary("summary", request, write)
 
 
     def SaveGraph(self):
         """
         A function to generate and save a bar graph for the selected test results (AWCD, Shannon Index, Shannon Evenness, or SAWCD),
         including distinguishing blank samples as a separate group.
+        The test and its summary are computed in the background, the graph is plotted when they are done.
         """
 
         # Check for saved data
@@ -657,6 +889,9 @@ class TestsWindow(QWidget):
 
         # Determine the type of result to plot
         result_type = self.result_type
+        if result_type not in RESULT_TYPES:
+            QMessageBox.warning(self, "Invalid Result Type", "Unsupported result type selected.")
+            return
 
         # Extract the selected stressor
         selected_stressors = [item.text() for item in self.list_widget[1].selectedItems()]
@@ -665,43 +900,37 @@ class TestsWindow(QWidget):
             return
         stressor = ", ".join(selected_stressors)
 
-        if result_type == "SAWCD":
+        # Extract selected carbon groups
+        selected_carbon_groups = [item.text() for item in self.list_widget[7].selectedItems()]
+        if result_type == "SAWCD" and not selected_carbon_groups:
+            QMessageBox.warning(self, "No Category Selected", "Please select at least one substrate category.")
+            return
 
-            selected_stressors = [item.text() for item in self.list_widget[1].selectedItems()]
-            if not selected_stressors:
-                QMessageBox.warning(self, "No Stressor Selected", "Please select a stressor before saving the graph.")
-                return
-            stressor = ", ".join(selected_stressors)
+        request = self.TestRequest(result_type)
+        if request is None:
+            return
 
-            # Extract selected carbon groups
-            selected_carbon_groups = [item.text() for item in self.list_widget[7].selectedItems()]
-            if not selected_carbon_groups:
-                QMessageBox.warning(self, "No Category Selected", "Please select at least one substrate category.")
-                return
+        records = request[0]
+        bacteria_set = set(record.bacteria for record in records)
+        bacteria_name = ", ".join(bacteria_set) if len(bacteria_set) > 1 else next(iter(bacteria_set), "Unknown")
 
-            # Calculate SAWCD results
-            sawcd_results = self.CalculateSAWCD()
-            if not sawcd_results:
-                return
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Graph", "", "PNG files (*.png);;PDF files (*.pdf)")
+        if not file_name:
+            return
 
-            # Extract unique concentrations, times, and groups
+        def save(fig):
+            # Save the graph to a file
+            plt.tight_layout()
+            plt.savefig(file_name, format="png" if file_name.endswith(".png") else "pdf", bbox_inches="tight")
+            QMessageBox.information(self, "Graph Saved", f"Graph has been saved to {file_name}.")
+            plt.close(fig)
 
-            bacterias = set(record.bacteria for record, _ in sawcd_results)
-            bacteria_name = ", ".join(bacterias) if len(bacterias) > 1 else next(iter(bacterias), "Unknown")
-            concentrations = sorted(set(record.concentration for record, _ in sawcd_results))
-            times = sorted(set(record.time for record, _ in sawcd_results))
+        def plot_sawcd(keys, stats):
+            # Sum of SAWCD per (concentration, time, group) from the aggregation engine
             groups = selected_carbon_groups
-
-            # Initialize grouped data structure
-            grouped_data = {
-                (conc, time): {group: 0 for group in groups}
-                for conc in concentrations for time in times
-            }
-
-            # Populate grouped data with SAWCD values
-            for record, (group, sawcd) in sawcd_results:
-                if group in grouped_data[(record.concentration, record.time)]:
-                    grouped_data[(record.concentration, record.time)][group] += sawcd
+            grouped_data = {}
+            for (conc, time, group), total in zip(keys, stats["sum"]):
+                grouped_data.setdefault((conc, time), {group: 0 for group in groups})[group] = total
 
 
             # Normalize values to percentages
@@ -749,74 +978,36 @@ class TestsWindow(QWidget):
             ax.set_title(f'{result_type} for {bacteria_name} consortium')
             ax.legend(title="Carbon Source Groups", bbox_to_anchor=(1.05, 1), loc='upper left')
 
-            # Save the graph
-            file_name, _ = QFileDialog.getSaveFileName(self, "Save Graph", "", "PNG files (*.png);;PDF files (*.pdf)")
-            if file_name:
-                plt.tight_layout()
-                plt.savefig(file_name, format="png" if file_name.endswith(".png") else "pdf", bbox_inches="tight")
-                QMessageBox.information(self, "Graph Saved", f"Graph has been saved to {file_name}.")
-
-            plt.close(fig)
+            save(fig)
 
-            
-        else:
-            # Handle AWCD, Shannon Index, or Shannon Evenness using the swapped implementation
-            if result_type == "AWCD":
-                calculated_results = self.CalculateAWCD()
-            elif result_type == "Shannon Index":
-                calculated_results = self.CalculateShannonIndex()
-            elif result_type == "Shannon Evenness":
-                calculated_results = self.CalculateShannonEvenness()
-            else:
-                QMessageBox.warning(self, "Invalid Result Type", "Unsupported result type selected.")
-                return
+        def plot_means(keys, stats):
+            # Mean and SEM per (concentration, time) from the aggregation engine, blanks are a separate "Blank" concentration
+            means = dict(zip(keys, stats["mean"]))
+            errors = dict(zip(keys, np.nan_to_num(stats["sem"])))
 
-            # Prepare data for plotting
-            results = []
-            for (record, matrix), (_, result_value) in zip(self.saved_data, calculated_results):
-                is_blank = record.blank == "Yes"  # Check if the record is marked as "blank"
-                results.append({
-                    'bacteria': record.bacteria,
-                    'stressor': record.stressor,
-                    'concentration': "Blank" if is_blank else record.concentration,  # Replace concentration with "Blank" for blanks
-                    'time': record.time,
-                    'value': result_value
-                })
-
-            # Organize data
-            concentrations = sorted(set(result['concentration'] for result in results if result['concentration'] != "Blank"))
-            if any(result['concentration'] == "Blank" for result in results):
+            concentrations = sorted(set(conc for conc, _ in keys if conc != "Blank"))
+            if any(conc == "Blank" for conc, _ in keys):
                 concentrations = ["Blank"] + concentrations  # Ensure "Blank" is the first in the order
 
-            times = sorted(set(result['time'] for result in results))
-            bacteria_set = set(result['bacteria'] for result in results)
-            bacteria_name = ", ".join(bacteria_set) if len(bacteria_set) > 1 else next(iter(bacteria_set), "Unknown")
-
-            # Dictionary to store values grouped by concentration and time
-            grouped_data = {conc: {time: [] for time in times} for conc in concentrations}
-            for result in results:
-                conc = result['concentration']  # "Blank" or the actual concentration
-                if result['value'] is not None:
-                    grouped_data[conc][result['time']].append(result['value'])
+            times = sorted(set(time for _, time in keys))
 
             # Prepare the plot
             fig, ax = plt.subplots(figsize=(12, 8))
             bar_width = 0.25
             x_positions = np.arange(len(concentrations))
 
-            colormap = cm.get_cmap("Set2", len(times))  # Set2 with discrete colors
+            colormap = plt.get_cmap("Set2", len(times))  # Set2 with discrete colors
             time_colors = [colormap(i) for i in range(len(times))]
 
             # Plot data
             for t_idx, time in enumerate(times):
-                values = [
-                    np.mean(grouped_data[conc][time]) if grouped_data[conc][time] else 0
-                    for conc in concentrations
-                ]
+                values = [means.get((conc, time), 0) for conc in concentrations]
                 ax.bar(
                     x_positions + t_idx * bar_width,
                     values,
                     bar_width,
+                    yerr=[errors.get((conc, time), 0) for conc in concentrations],
+                    capsize=3,
                     label=f"{time} hours",
                     color=time_colors[t_idx]  # Use Set2 colors
                 )
@@ -829,11 +1020,6 @@ class TestsWindow(QWidget):
             ax.set_xticklabels([str(conc) if conc != "Blank" else "Blank" for conc in concentrations])  # Use "Blank" label
             ax.legend(title="Time", bbox_to_anchor=(1.05, 1), loc='upper left')
 
-            # Save the graph to a file
-            file_name, _ = QFileDialog.getSaveFileName(self, "Save Graph", "", "PNG files (*.png);;PDF files (*.pdf)")
-            if file_name:
-                plt.tight_layout()
-                plt.savefig(file_name, format="png" if file_name.endswith(".png") else "pdf", bbox_inches="tight")
-                QMessageBox.information(self, "Graph Saved", f"Graph has been saved to {file_name}.")
+            save(fig)
 
-            plt.close(fig)
+        self.RunSummary("graph", request, plot_sawcd if result_type == "SAWCD" else plot_means)
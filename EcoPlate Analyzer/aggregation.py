@@ -0,0 +1,40 @@
+#   aggregation engine
+'''Group-by aggregation of per-record values over metadata keys;
+    key columns are coded to integers, statistics are reduced with bincount'''
+
+import numpy as np
+
+
+def group_codes(columns):
+    """Group code of every record for the key columns (lists of values, one per key).
+    Returns the codes and the sorted key tuples of the groups."""
+    codes = []
+    categories = []
+    for column in columns:
+        values, inverse = np.unique(np.asarray(column), return_inverse=True)
+        categories.append(values.tolist())
+        codes.append(inverse.ravel())
+
+    combined = np.ravel_multi_index(codes, [len(values) for values in categories]) if codes else np.zeros(0, dtype=np.intp)
+    groups, group_of_record = np.unique(combined, return_inverse=True)
+    keys = [tuple(values[index] for values, index in zip(categories, indices))
+            for indices in zip(*np.unravel_index(groups, [len(values) for values in categories]))]
+    return group_of_record.ravel(), keys
+
+
+def aggregate(values, columns):
+    """Count, sum, mean, SD (sample) and SEM of the values per key of the columns;
+    returns the key tuples and {statistic: array in key order}, SD and SEM are NaN for single values"""
+    values = np.asarray(values, dtype=np.float64)
+    codes, keys = group_codes(columns)
+    group_count = len(keys)
+
+    count = np.bincount(codes, minlength=group_count)
+    total = np.bincount(codes, weights=values, minlength=group_count)
+    mean = total / np.maximum(count, 1)
+    squares = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=group_count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sd = np.where(count > 1, np.sqrt(squares / (count - 1)), np.nan)
+        sem = sd / np.sqrt(count)
+
+    return keys, {"count": count, "sum": total, "mean": mean, "sd": sd, "sem": sem}
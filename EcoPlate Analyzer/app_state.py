@@ -1,5 +1,16 @@
 #   app state
 
+import weakref
+
+import numpy as np
+
+import Record
+import plate_matrix
+import query_engine
+import record_store
+
+RECORD_FIELDS = ['bacteria', 'stressor', 'concentration', 'time', 'blank', 'repetition', 'filename']     # nested dictionary keys
+
 '''Class that manages the application state, 
     stores constant data sets
     and nested dictionary for ecoplateExperiment records'''
@@ -57,19 +68,292 @@ class AppState:
             "phenolic compounds": ["2-HydroxyBenzoic Acid", "4-HydroxyBenzoic Acid"]
         }
 
-        #   nested dictionary for EcoplateExperimentRecords
-        self.Records_dict = {
-            'bacteria': {},
-            'stressor': {}, 
-            'concentration': {},
-            'time': {},
-            'blank': {},
-            'repetition': {},
-            'filename': {}
-        }
+        # compiled carbon sources layout: name -> flat well index (row * 4 + column), group -> well index array
+        self.carbon_source_index = {name: index for index, name in enumerate(name for row in carbon_sources for name in row)}
+        self.carbon_group_wells = {group: np.array([self.carbon_source_index[name] for name in sources], dtype=np.intp)
+                                   for group, sources in self.carbon_source_groups.items()}
+
+        #   nested dictionary for EcoplateExperimentRecords (value -> {row: record}, insertion ordered)
+        self._records_dict = {field: {} for field in RECORD_FIELDS}
         
-        #   variable for EcoplateExperimentRecords all records
-        self.all_records = []
+        #   variable for EcoplateExperimentRecords all records (row -> record, insertion ordered)
+        self.all_records = {}
+
+        #   value sets of the fields; a bucket of the nested dictionary is the refcount of its value,
+        #   a value is added/removed when its bucket is created/emptied
+        self.value_sets = {
+            'bacteria': self.bacteria_set,
+            'stressor': self.stressor_set,
+            'concentration': self.concentration_set,
+            'time': self.time_set,
+            'repetition': self.repetition_set,
+            'filename': self.filename_set
+        }
+
+        #   callbacks notified about value set changes
+        self.subscribers = []
+
+        #   reverse map: row -> record info (keys of the record in the nested dictionary, same order)
+        self._record_entries = {}
+
+        #   bitmap index of the nested dictionary for filtering
+        self.bitmap_index = query_engine.BitmapIndex()
+
+        #   hash indexes for duplicate checks: record key -> count, ecoplate values -> count
+        self.key_index = {}
+        self.plate_index = {}
+
+        #   records loaded from the store and their info columns, indexed on first use (nested dictionary, bitmap index,
+        #   hash indexes), so startup only reads the store
+        self.unindexed = ([], [])
+
+        #   metric cache: row -> {(metric, carbon group): value}, filled lazily, dropped with the record
+        self.metric_cache = {}
+
+        #   persistent storage of records and the column store of their ecoplate values
+        self.store = record_store.RecordStore()
+        self.plates = plate_matrix.PlateMatrix()
+        self.load_records()
+
+
+    def load_records(self):
+        """Loads record info from the store; ecoplate values are read from the memory-mapped
+        plate matrix, rows missing there are restored from the store; a plate matrix written
+        for another store or an older write of the store (stamp mismatch) is restored completely"""
+        rows = self.store.load_metadata()
+        if not rows:
+            return
+
+        record_ids, *columns = map(list, zip(*rows))
+        columns[4] = [bool(blank) for blank in columns[4]]       # blank is stored as 0/1
+        self.plates.ensure_capacity(max(record_ids) + 1)
+        if self.plates.stamp == self.store.stamp():
+            missing = self.plates.missing_rows(record_ids)
+        else:
+            missing = record_ids
+        if missing:
+            ecoplates = self.store.load_ecoplates(missing)
+            self.plates.values[list(ecoplates)] = np.stack(list(ecoplates.values()))
+            self.plates.flush()
+        if self.plates.stamp != self.store.stamp():
+            self.plates.set_stamp(self.store.stamp())
+
+        self.plates.set_columns(record_ids, columns)
+
+        view = Record.EcoplateExperimentRecord.view
+        records = [view(self.plates, record_id) for record_id in record_ids]
+        self.all_records.update(zip(record_ids, records))
+        self.unindexed = (records, columns)
+
+        field_columns = dict(zip(RECORD_FIELDS, columns))
+        self.notify([(field, value) for field in self.value_sets for value in set(field_columns[field])], True)
+
+
+    @property
+    def Records_dict(self):
+        self.index_loaded()
+        return self._records_dict
+
+
+    @property
+    def record_entries(self):
+        self.index_loaded()
+        return self._record_entries
+
+
+    def index_loaded(self):
+        """Builds the indexes of the records loaded from the store, on first use"""
+        records, columns = self.unindexed
+        if records:
+            self.unindexed = ([], [])
+            self.index_records(records, list(zip(*columns)))
+
+
+    def query(self, selections):
+        """Records matching the selections {field: [values]} (nested dictionary keys), in insertion order;
+        values are ORed within a field and fields are ANDed"""
+        self.index_loaded()
+        return [self.all_records[row] for row in self.bitmap_index.query(selections)]
+
+
+    @staticmethod
+    def record_key(record):
+        """Key of a record without ecoplate values and blank flag"""
+        return (record.bacteria, record.stressor, record.concentration, record.time, record.repetition)
+
+
+    @staticmethod
+    def plate_key(ecoplate):
+        """Canonical bytes of ecoplate values (float32, -0.0 stored as 0.0)"""
+        return (np.ascontiguousarray(ecoplate, dtype=np.float32) + np.float32(0)).tobytes()
+
+
+    def key_exists(self, record):
+        self.index_loaded()
+        return self.record_key(record) in self.key_index
+
+
+    def plate_exists(self, ecoplate):
+        self.index_loaded()
+        return self.plate_key(ecoplate) in self.plate_index
+
+
+    def subscribe(self, callback):
+        """Registers callback(field, value, added) called when a value enters or leaves a value set;
+        bound methods are held weakly, so closed windows are dropped"""
+        try:
+            self.subscribers.append(weakref.WeakMethod(callback))
+        except TypeError:
+            self.subscribers.append(lambda: callback)
+
+
+    def notify(self, changes, added):
+        """Updates the value sets by (field, value) changes and notifies the subscribers"""
+        for field, value in changes:
+            if added:
+                self.value_sets[field].add(value)
+            else:
+                self.value_sets[field].discard(value)
+
+        callbacks = [reference() for reference in self.subscribers]
+        self.subscribers = [reference for reference, callback in zip(self.subscribers, callbacks) if callback is not None]
+        for callback in callbacks:
+            if callback is not None:
+                for field, value in changes:
+                    callback(field, value, added)
+
+
+    def cached_metrics(self, records, names, group=None):
+        """Cached values of metrics of the records, {metric: values} with None for the values not cached,
+        and the indices of the records missing any of the metrics"""
+        keys = [(name, group) for name in names]
+        entries = [self.metric_cache.get(record.row, {}) for record in records]
+        missing = [index for index, entry in enumerate(entries) if any(key not in entry for key in keys)]
+        return {name: [entry.get(key) for entry in entries] for name, key in zip(names, keys)}, missing
+
+
+    def cache_metrics(self, records, computed, group=None):
+        """Caches computed metrics of the records, {metric: values}; records removed in the meantime
+        (the values were computed by a background job) are skipped"""
+        for name, values in computed.items():
+            key = (name, group)
+            for record, value in zip(records, np.asarray(values).tolist()):
+                if self.all_records.get(record.row) is record:
+                    self.metric_cache.setdefault(record.row, {})[key] = value
+
+
+    def carbon_projection(self, sources=(), groups=()):
+        """Labels and flat well indices of the selected carbon sources (label: name)
+        or of the sources of the selected groups (label: (group, name)); unknown names are skipped"""
+        if sources:
+            labels = [name for name in sources if name in self.carbon_source_index]
+            wells = [self.carbon_source_index[name] for name in labels]
+        else:
+            labels = [(group, name) for group in groups if group in self.carbon_source_groups
+                      for name in self.carbon_source_groups[group]]
+            wells = [self.carbon_source_index[name] for _, name in labels]
+        return labels, np.array(wells, dtype=np.intp)
+
+
+    def carbon_wells(self, name):
+        """Well index array of a carbon group or a single carbon source"""
+        if name in self.carbon_group_wells:
+            return self.carbon_group_wells[name]
+        return np.array([self.carbon_source_index[name]], dtype=np.intp)
+
+
+    def take_plates(self, records):
+        """N x 8 x 4 ecoplate values of the records, in one slice of the plate matrix"""
+        return self.plates.take([record.row for record in records])
+
+
+    def add_records(self, records):
+        """Saves records to the store and adds them to the nested dictionary, value sets and all records in one operation"""
+        def write_plates(record_ids):
+            for record, record_id in zip(records, record_ids):
+                record.attach(self.plates, record_id)
+            self.plates.flush()
+            self.plates.set_stamp(self.store.stamp())
+
+        self.index_loaded()
+        self.store.insert(records, write_plates)
+        self.index_records(records)
+
+
+    def index_records(self, records, infos=None):
+        """Adds records to the nested dictionary, value sets and all records;
+        infos are record info tuples (FIELDS order) when they are already at hand"""
+        if infos is None:
+            infos = [[getattr(record, field) for field in plate_matrix.FIELDS] for record in records]
+
+        columns = dict(zip(RECORD_FIELDS, map(list, zip(*infos))))
+        if not columns:
+            return
+
+        rows = [record.row for record in records]
+
+        # nested dictionary, field by field; new buckets are new values of the value sets
+        new_values = []
+        for field, column in columns.items():
+            sub_dict = self._records_dict[field]
+            for row, record, value in zip(rows, records, column):
+                bucket = sub_dict.get(value)
+                if bucket is None:
+                    bucket = sub_dict[value] = {}
+                    if field in self.value_sets and value not in self.value_sets[field]:
+                        new_values.append((field, value))       # values of loaded records are known already
+                bucket[row] = record
+
+        # duplicate check indexes
+        for key in zip(columns['bacteria'], columns['stressor'], columns['concentration'], columns['time'], columns['repetition']):
+            self.key_index[key] = self.key_index.get(key, 0) + 1
+        for plate in np.ascontiguousarray(self.take_plates(records) + np.float32(0)):
+            plate_key = plate.tobytes()
+            self.plate_index[plate_key] = self.plate_index.get(plate_key, 0) + 1
+
+        self.bitmap_index.add(rows, {field: columns[field] for field in query_engine.FIELDS})
+        self._record_entries.update(zip(rows, map(tuple, infos)))
+        self.all_records.update(zip(rows, records))
+        if new_values:
+            self.notify(new_values, True)
+
+
+    def remove_records(self, records_to_remove):
+        """Removes records from the store, the nested dictionary and all records;
+        only the index entries of the removed records are touched"""
+        self.index_loaded()
+        self.store.delete(records_to_remove)
+        self.plates.set_stamp(self.store.stamp())     # values of the other rows stay current
+
+        removed_values = []
+        for record in records_to_remove:
+            row = record.row
+            info = self._record_entries.pop(row)
+            self.plates.remove_row(row)
+
+            for field, value in zip(self._records_dict, info):
+                records = self._records_dict[field][value]
+                del records[row]
+                # delete subkey if subkey's dict empty, the value leaves its value set
+                if not records:
+                    del self._records_dict[field][value]
+                    if field in self.value_sets:
+                        removed_values.append((field, value))
+
+            self.bitmap_index.remove(row, dict(zip(query_engine.FIELDS, info)))
+
+            bacteria, stressor, concentration, time, blank, repetition, file_name = info
+            for index, key in ((self.key_index, (bacteria, stressor, concentration, time, repetition)),
+                               (self.plate_index, self.plate_key(record.ecoplate))):
+                index[key] -= 1
+                if not index[key]:
+                    del index[key]
+
+            del self.all_records[row]
+            self.metric_cache.pop(row, None)
+
+        if removed_values:
+            self.notify(removed_values, False)
 
 
     @classmethod
@@ -0,0 +1,166 @@
+#   batch import
+'''Batch import of a folder of plate reader workbooks;
+    record info is taken from a manifest .csv file,
+    workbooks are parsed in a process pool (spawned processes, the GUI process is not forked)'''
+
+import csv
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import Record
+import app_state
+import plate_cache
+import plate_reader
+
+
+MANIFEST_NAME = "manifest.csv"
+MANIFEST_FIELDS = ["file_name", "part", "bacteria", "stressor", "concentration", "time", "blank", "repetition"]
+BLANK_VALUES = {"yes": True, "true": True, "1": True, "no": False, "false": False, "0": False, "": False}
+
+
+def read_manifest(manifest_path):
+    """Read the manifest file.
+    Every row describes one record (1/3 of ecoplate), part is 1, 2 or 3 (columns 1-4, 5-8, 9-12).
+    Returns a dictionary {file_name: {part: row}}."""
+    manifest = {}
+
+    with open(manifest_path, newline='', encoding='utf-8-sig') as csv_file:
+        reader = csv.DictReader(csv_file)
+        missing = [field for field in MANIFEST_FIELDS if field not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Manifest is missing columns: {', '.join(missing)}")
+
+        for line, row in enumerate(reader, start=2):
+            row = {field: (row[field] or "").strip() for field in MANIFEST_FIELDS}
+            validate_row(row, line)
+
+            parts = manifest.setdefault(row["file_name"], {})
+            part = int(row["part"])
+            if part in parts:
+                raise ValueError(f"Line {line}: part {part} of {row['file_name']} is listed twice.")
+            parts[part] = row
+
+    for file_name, parts in manifest.items():
+        if sorted(parts) != [1, 2, 3]:
+            raise ValueError(f"Exactly 3 records (parts 1, 2, 3) are needed for the file: {file_name}")
+
+    return manifest
+
+
+def validate_row(row, line):
+    """Check a manifest row the same way as the input panel of the main window"""
+    if row["part"] not in ("1", "2", "3"):
+        raise ValueError(f"Line {line}: part must be 1, 2 or 3.")
+    if not row["bacteria"]:
+        raise ValueError(f"Line {line}: fill in the bacteria info.")
+    if not row["stressor"]:
+        raise ValueError(f"Line {line}: fill in the stressor info.")
+
+    for field, number_type in (("concentration", float), ("time", int), ("repetition", int)):
+        try:
+            value = number_type(row[field])
+        except ValueError:
+            raise ValueError(f"Line {line}: {field} must be a number.")
+        if value < 0:
+            raise ValueError(f"Line {line}: {field} must be at least 0.")
+
+    if row["blank"].lower() not in BLANK_VALUES:
+        raise ValueError(f"Line {line}: blank must be yes or no.")
+
+
+def parse_files(file_paths, max_workers=None):
+    """Parse workbooks, returns corrected matrices in the same order.
+    Files found in the plate cache are not parsed again, the rest is parsed in a process pool."""
+    cache = plate_cache.get_cache()
+    digests = [cache.digest(path) for path in file_paths]
+    waves = [cache.get(digest) for digest in digests]
+    missing = [index for index, wave in enumerate(waves) if wave is None]
+
+    if len(missing) > 1:
+        chunksize = max(1, len(missing) // (4 * (max_workers or os.cpu_count() or 1)))
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            parsed = list(executor.map(plate_reader.read_plate_waves,
+                                       [file_paths[index] for index in missing], chunksize=chunksize))
+    else:
+        parsed = [plate_reader.read_plate_waves(file_paths[index]) for index in missing]
+
+    for index, (wave_590, wave_720) in zip(missing, parsed):
+        waves[index] = (wave_590, wave_720, plate_reader.correct_plate(wave_590, wave_720))
+        cache.put(digests[index], *waves[index])
+    cache.save()
+
+    return [wave[2] for wave in waves]
+
+
+def build_records(file_name, wave, parts):
+    """Create 3 records from one corrected 8x12 matrix"""
+    records = []
+    for part in (1, 2, 3):
+        row = parts[part]
+        start_col = (part - 1) * 4
+        ecoplate_values = wave[:, start_col:start_col + 4].astype(np.float32)
+
+        records.append(Record.EcoplateExperimentRecord(
+            row["bacteria"], row["stressor"], row["concentration"], row["time"],
+            BLANK_VALUES[row["blank"].lower()], row["repetition"], ecoplate_values, file_name))
+    return records
+
+
+def parse_folder(directory, manifest_path=None, loaded_files=(), max_workers=None):
+    """Read the manifest and parse the workbooks it lists from the directory, without touching AppState
+    (runs in a background job); loaded_files are the file names already loaded.
+    Returns the manifest and the corrected matrices of its files in file name order."""
+    manifest = read_manifest(manifest_path or os.path.join(directory, MANIFEST_NAME))
+
+    file_names = sorted(manifest)
+    missing = [name for name in file_names if not os.path.isfile(os.path.join(directory, name))]
+    if missing:
+        raise ValueError(f"Files listed in the manifest were not found: {', '.join(missing)}")
+
+    already_loaded = [name for name in file_names if name in loaded_files]
+    if already_loaded:
+        raise ValueError(f"Files have been loaded already: {', '.join(already_loaded)}")
+
+    return manifest, parse_files([os.path.join(directory, name) for name in file_names], max_workers)
+
+
+def add_folder(manifest, waves):
+    """Create the records of parsed workbooks (parse_folder) and add them to AppState in one operation,
+    only when none of them is loaded or exists already. Returns the list of added records."""
+    appState = app_state.AppState.get_instance()
+    file_names = sorted(manifest)
+
+    already_loaded = [name for name in file_names if name in appState.filename_set]
+    if already_loaded:
+        raise ValueError(f"Files have been loaded already: {', '.join(already_loaded)}")
+
+    new_records = []
+    for file_name, wave in zip(file_names, waves):
+        new_records.extend(build_records(file_name, wave, manifest[file_name]))
+
+    # duplicates among new records and in data base (hash index lookups)
+    new_keys = set()
+    new_plates = set()
+    for record in new_records:
+        key = appState.record_key(record)
+        plate = appState.plate_key(record.ecoplate)
+        if key in new_keys or appState.key_exists(record):
+            raise ValueError(f"Record {', '.join(key)} from {record.file_name} already exists. No records were added.")
+        if plate in new_plates or appState.plate_exists(record.ecoplate):
+            raise ValueError(f"Record from {record.file_name} has the same ecoplate values as an existing one. No records were added.")
+        new_keys.add(key)
+        new_plates.add(plate)
+
+    appState.add_records(new_records)
+    return new_records
+
+
+def import_folder(directory, manifest_path=None, max_workers=None):
+    """Import every workbook listed in the manifest from the directory.
+    Records are added to AppState only when all files are valid.
+    Returns the list of added records."""
+    appState = app_state.AppState.get_instance()
+    return add_folder(*parse_folder(directory, manifest_path, appState.filename_set, max_workers))
@@ -0,0 +1,61 @@
+#   blank correction
+'''Subtraction of blank plates from treated plates;
+    every non-blank record is joined to the blank records with the same key
+    (bacteria, time and file by default) and the mean blank well vector
+    of the key is subtracted from its wells'''
+
+import numpy as np
+
+import metrics
+
+
+BLANK_KEY = ("bacteria", "time", "filename")     # nested dictionary fields joining a record to its blanks
+
+
+def correct(values, codes, blank_values, blank_codes, key_count):
+    """Subtract the mean blank well vector of every key from the N x 32 values;
+    codes are the key codes of the records (-1: not corrected), blank_codes the key codes of the blanks.
+    Returns the corrected values and a mask of the corrected records."""
+    sums = np.zeros((key_count, values.shape[1]))
+    np.add.at(sums, blank_codes, blank_values)
+    counts = np.bincount(blank_codes, minlength=key_count)
+    with np.errstate(invalid='ignore'):
+        means = sums / counts[:, None]
+
+    matched = codes >= 0
+    corrected = values.copy()
+    corrected[matched] -= means[codes[matched]]
+    return corrected, matched
+
+
+def blank_inputs(appState, records, key_fields=BLANK_KEY):
+    """Copies of the inputs of the blank correction of the records (the plate rows and blank keys),
+    taken from the app state in the GUI thread: the plates of the records and (key codes of the records,
+    blank plates, key codes of the blanks, key count)"""
+    fields = list(appState.Records_dict)
+    positions = [fields.index(field) for field in key_fields]
+    blank_position = fields.index('blank')
+    entries = appState.record_entries
+
+    # blanks through the nested dictionary, coded by key
+    blank_rows = list(appState.Records_dict['blank'].get(True, {}))
+    key_codes = {}
+    blank_codes = np.array([key_codes.setdefault(tuple(entries[row][position] for position in positions), len(key_codes))
+                            for row in blank_rows], dtype=np.intp)
+
+    codes = np.array([-1 if entries[record.row][blank_position]
+                      else key_codes.get(tuple(entries[record.row][position] for position in positions), -1)
+                      for record in records], dtype=np.intp)
+
+    return appState.take_plates(records), (codes, appState.plates.take(blank_rows), blank_codes, len(key_codes))
+
+
+def well_values(plates, blank=None):
+    """N x 32 well array of N x 8 x 4 plates, blank corrected by the blank inputs (see blank_inputs) if given"""
+    values = metrics.well_array(plates)
+    if blank is None:
+        return values
+    codes, blank_plates, blank_codes, key_count = blank
+    corrected, _ = correct(values, codes, metrics.well_array(blank_plates), blank_codes, key_count)
+    return corrected
+
@@ -0,0 +1,122 @@
+#   bootstrap service
+'''Bootstrap confidence intervals of AWCD and the Shannon index per group of records;
+    every resample draws the records (repetitions) of the group and the substrate wells with replacement,
+    resamples are generated as index arrays and evaluated in batches with the vectorized metrics,
+    groups are spread across a process pool (spawned processes, the GUI process is not forked),
+    every group has its own seed spawned from one seed'''
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+
+import numpy as np
+
+import aggregation
+import metrics
+
+
+METRICS = ("AWCD", "Shannon Index")
+RESAMPLES = 10000
+CONFIDENCE = 0.95
+BATCH_ELEMENTS = 1 << 22            # resampled wells evaluated at once
+PARALLEL_ELEMENTS = 1 << 24         # resampled wells from which the process pool is used
+TASKS_PER_WORKER = 4
+
+
+def resample_indices(rng, count, wells, resamples):
+    """Record (resamples x count) and well (resamples x wells) index arrays of the resamples"""
+    return rng.integers(0, count, (resamples, count)), rng.integers(0, wells, (resamples, wells))
+
+
+def multiplicities(indices, size):
+    """Times every index 0..size-1 is drawn in every row of the index array (rows x size)"""
+    rows = len(indices)
+    flat = (np.arange(rows)[:, None] * size + indices).ravel()
+    return np.bincount(flat, minlength=rows * size).reshape(rows, size).astype(np.float64)
+
+
+def resample_metrics(profiles, records, wells):
+    """Metrics of every resample of the count x wells substrate profiles of a group:
+    mean of the metric of the resampled records on the resampled wells; returns resamples x len(METRICS).
+    The wells drawn are weighted by their multiplicity m, so with T = sum(m x) over the positive wells
+    the Shannon index of a resampled record is ln T - sum(m x ln x) / T and no resampled array is built."""
+    count, size = profiles.shape
+    record_weights = multiplicities(records, count)
+    well_weights = multiplicities(wells, size).T
+
+    positive = np.maximum(profiles, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.where(positive > 0, positive * np.log(positive), 0.0)
+
+    awcd = profiles @ well_weights / size            # count x resamples
+    total = positive @ well_weights
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index = np.where(total > 0, np.log(total) - (logs @ well_weights) / total, 0.0)
+
+    return np.column_stack([(record_weights * awcd.T).sum(axis=1), (record_weights * index.T).sum(axis=1)]) / count
+
+
+def bootstrap_group(profiles, seed, resamples=RESAMPLES, confidence=CONFIDENCE):
+    """Percentile interval of every metric of one group; returns len(METRICS) x 2 (low, high)"""
+    rng = np.random.default_rng(seed)
+    count, wells = profiles.shape
+    batch = max(1, BATCH_ELEMENTS // (count * wells))
+
+    estimates = np.empty((resamples, len(METRICS)))
+    for start in range(0, resamples, batch):
+        stop = min(start + batch, resamples)
+        records, well_indices = resample_indices(rng, count, wells, stop - start)
+        estimates[start:stop] = resample_metrics(profiles, records, well_indices)
+
+    tail = (1 - confidence) / 2
+    return np.quantile(estimates, [tail, 1 - tail], axis=0).T
+
+
+def bootstrap_groups(task):
+    """Process pool task: intervals of a list of (profiles, seed) groups"""
+    groups, resamples, confidence = task
+    return [bootstrap_group(profiles, seed, resamples, confidence) for profiles, seed in groups]
+
+
+def bootstrap(values, columns, resamples=RESAMPLES, confidence=CONFIDENCE, seed=0,
+              water_mask=metrics.WATER_MASK, workers=None, check=None):
+    """Bootstrap confidence intervals of the METRICS per key of the columns (lists of values, one per key)
+    for the N x 32 well array; the result depends on the seed only, not on the number of workers.
+    check(done, total) is called after every group (task of the pool), a background job raises there when cancelled.
+    Returns the key tuples, the record counts, the point estimates (groups x metrics)
+    and the intervals (groups x metrics x 2)."""
+    profiles = values[:, ~water_mask]
+    codes, keys = aggregation.group_codes(columns)
+    counts = np.bincount(codes, minlength=len(keys))
+
+    record_metrics = metrics.community_metrics(values, water_mask)
+    point = np.column_stack([np.bincount(codes, weights=record_metrics[metric], minlength=len(keys)) / np.maximum(counts, 1)
+                             for metric in METRICS])
+
+    order = np.argsort(codes, kind='stable')
+    seeds = np.random.SeedSequence(seed).spawn(len(keys))
+    groups = list(zip(np.split(profiles[order], np.cumsum(counts)[:-1]), seeds))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(groups) < 2 or resamples * profiles.size < PARALLEL_ELEMENTS:
+        tasks = [([group], resamples, confidence) for group in groups]
+        results = map(bootstrap_groups, tasks)
+        executor = None
+    else:
+        # contiguous chunks keep the groups in key order
+        chunks = np.array_split(np.arange(len(groups)), min(len(groups), workers * TASKS_PER_WORKER))
+        tasks = [([groups[index] for index in chunk], resamples, confidence) for chunk in chunks]
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        results = executor.map(bootstrap_groups, tasks)
+
+    intervals = []
+    try:
+        for done, result in enumerate(results, 1):
+            intervals.extend(result)
+            if check is not None:
+                check(done, len(tasks))
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return keys, counts, point, np.array(intervals).reshape(len(keys), len(METRICS), 2)
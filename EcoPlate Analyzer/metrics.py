@@ -0,0 +1,101 @@
+#   metrics engine
+'''Community-level metrics (AWCD, SAWCD, Shannon, Simpson and McIntosh indices,
+    richness, Shannon and Gini evenness) of all records at once;
+    input is an N x 32 well array of the records and a water mask of the 32 wells'''
+
+import numpy as np
+
+
+PLATE_SHAPE = (8, 4)
+WELLS = PLATE_SHAPE[0] * PLATE_SHAPE[1]
+WATER_MASK = np.zeros(WELLS, dtype=bool)        # well A1 of every third of the ecoplate is water
+WATER_MASK[0] = True
+RICHNESS_THRESHOLD = 0.25      # OD above which a substrate well counts as utilized
+SWEEP_THRESHOLDS = np.round(np.arange(0.10, 0.50 + 1e-9, 0.05), 2)     # thresholds of the richness sweep
+
+
+def well_array(plates):
+    """N x 8 x 4 ecoplate values -> N x 32 float64 well array (row-major, A1, A2, ..., H4)"""
+    return np.asarray(plates, dtype=np.float64).reshape(-1, WELLS)
+
+
+def awcd(values, water_mask=WATER_MASK):
+    """Average well color development: mean of the substrate wells"""
+    return values[:, ~water_mask].mean(axis=1)
+
+
+def sawcd(values, groups):
+    """Substrate AWCD: mean of the negative-clipped wells of every group;
+    groups is a list of well index arrays, returns an N x len(groups) array"""
+    if not groups:
+        return np.zeros((len(values), 0))
+    clipped = np.maximum(values, 0)
+    return np.column_stack([clipped[:, wells].mean(axis=1) if len(wells) else np.zeros(len(values))
+                            for wells in groups])
+
+
+def richness_name(threshold=RICHNESS_THRESHOLD):
+    return f"Richness (OD > {threshold:g})"
+
+
+def community_names(threshold=RICHNESS_THRESHOLD):
+    """Names of the whole-plate metrics in the order of community_metrics"""
+    return ["AWCD", "Shannon Index", "Shannon Evenness", "Simpson Index", "McIntosh Index",
+            richness_name(threshold), "Gini Evenness"]
+
+
+def diversity(values, water_mask=WATER_MASK, threshold=RICHNESS_THRESHOLD):
+    """Diversity indices of the positive substrate wells from one computation of the proportions p:
+    Shannon H = -sum(p ln p) (0 without positive wells), evenness E = H / ln(S) (0 with less than 2 positive wells),
+    Simpson 1 - sum(p^2), McIntosh U = sqrt(sum(n^2)), richness (wells with OD > threshold)
+    and Gini evenness 1 - G of the negative-clipped wells"""
+    substrate = values[:, ~water_mask]
+    positive = np.where(substrate > 0, substrate, 0.0)
+    total = positive.sum(axis=1, keepdims=True)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        proportions = np.where(total > 0, positive / total, 0.0)
+        terms = np.where(proportions > 0, proportions * np.log(proportions), 0.0)
+    index = 0.0 - terms.sum(axis=1)
+
+    positive_count = (positive > 0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        evenness = np.where(positive_count > 1, index / np.log(np.maximum(positive_count, 2)), 0.0)
+
+    simpson = np.where(total[:, 0] > 0, 1 - (proportions ** 2).sum(axis=1), 0.0)
+    mcintosh = np.sqrt((positive ** 2).sum(axis=1))
+    richness = (substrate > threshold).sum(axis=1)
+
+    # Gini coefficient of the sorted wells: sum((2i - n - 1) x_i) / (n sum(x)), i = 1..n
+    wells = positive.shape[1]
+    weights = 2 * np.arange(1, wells + 1) - wells - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gini = np.where(total[:, 0] > 0, (np.sort(positive, axis=1) * weights).sum(axis=1) / (wells * total[:, 0]), 1.0)
+
+    return {
+        "Shannon Index": index,
+        "Shannon Evenness": evenness,
+        "Simpson Index": simpson,
+        "McIntosh Index": mcintosh,
+        richness_name(threshold): richness,
+        "Gini Evenness": 1 - gini,
+    }
+
+
+def community_metrics(values, water_mask=WATER_MASK, threshold=RICHNESS_THRESHOLD):
+    """All whole-plate metrics in one pass: {metric name: N values} in the order of community_names"""
+    return {"AWCD": awcd(values, water_mask), **diversity(values, water_mask, threshold)}
+
+
+def richness_sweep(values, thresholds=SWEEP_THRESHOLDS, water_mask=WATER_MASK):
+    """Richness of every record at every threshold in one broadcast comparison
+    (thresholds x records x wells); returns an N x len(thresholds) array"""
+    substrate = values[:, ~water_mask]
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    return (substrate[None, :, :] > thresholds[:, None, None]).sum(axis=2).T
+
+
+def tidy_sweep(counts, thresholds=SWEEP_THRESHOLDS):
+    """Sweep result in long form: record index, threshold and richness columns (one row per record and threshold)"""
+    records, steps = counts.shape
+    return np.repeat(np.arange(records), steps), np.tile(np.asarray(thresholds), records), counts.ravel()
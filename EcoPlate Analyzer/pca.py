@@ -0,0 +1,77 @@
+#   principal component analysis
+'''PCA of community-level physiological profiles (the 31 substrate wells, water excluded);
+    exact SVD for small data sets, randomized SVD for large ones;
+    the centered profile matrix is kept for re-projection'''
+
+import numpy as np
+
+import metrics
+
+
+EXACT_LIMIT = 20000     # records up to which the exact SVD is used
+OVERSAMPLES = 10        # extra random directions of the randomized SVD
+POWER_ITERATIONS = 2    # power iterations of the randomized SVD
+
+
+def randomized_svd(matrix, rank, seed=0):
+    """Truncated SVD of the matrix from a random projection (Halko, Martinsson, Tropp)"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(rank + OVERSAMPLES, min(matrix.shape))
+    basis, _ = np.linalg.qr(matrix @ rng.standard_normal((matrix.shape[1], sample_size)))
+    for _ in range(POWER_ITERATIONS):
+        # re-orthonormalized after every product, otherwise round-off washes out the lower components
+        basis, _ = np.linalg.qr(matrix.T @ basis)
+        basis, _ = np.linalg.qr(matrix @ basis)
+
+    u, s, vt = np.linalg.svd(basis.T @ matrix, full_matrices=False)
+    return (basis @ u)[:, :rank], s[:rank], vt[:rank]
+
+
+class PCAModel:
+
+    def __init__(self, values, water_mask=metrics.WATER_MASK):
+        """values is the N x 32 well array; records with missing (NaN) wells are left out"""
+        profiles = values[:, ~water_mask]
+        self.rows = np.flatnonzero(~np.isnan(profiles).any(axis=1))     # records used, indices into values
+        profiles = profiles[self.rows]
+
+        self.water_mask = water_mask
+        self.mean = profiles.mean(axis=0) if len(profiles) else np.zeros(profiles.shape[1])
+        self.centered = profiles - self.mean
+        self.total_variance = (self.centered ** 2).sum()
+
+        self.method = None
+        self.scores = None              # records x components
+        self.loadings = None            # substrates x components
+        self.explained = None           # explained variance ratio of the components
+
+
+    def fit(self, components=2, method="auto", seed=0):
+        """Decompose the centered matrix: method "exact", "randomized" or "auto" (exact up to EXACT_LIMIT records)"""
+        components = min(components, *self.centered.shape)
+        if method == "auto":
+            method = "exact" if len(self.centered) <= EXACT_LIMIT else "randomized"
+        if self.scores is not None and self.method == method and self.scores.shape[1] >= components:
+            return self
+
+        if method == "exact":
+            u, s, vt = np.linalg.svd(self.centered, full_matrices=False)
+            u, s, vt = u[:, :components], s[:components], vt[:components]
+        else:
+            u, s, vt = randomized_svd(self.centered, components, seed)
+
+        # deterministic signs: the largest loading of every component is positive
+        signs = np.sign(vt[np.arange(len(vt)), np.abs(vt).argmax(axis=1)])
+        signs[signs == 0] = 1
+        u, vt = u * signs, vt * signs[:, None]
+
+        self.method = method
+        self.scores = u * s
+        self.loadings = vt.T
+        self.explained = s ** 2 / self.total_variance if self.total_variance > 0 else np.zeros_like(s)
+        return self
+
+
+    def project(self, values):
+        """Scores of other N x 32 well arrays in the fitted components"""
+        return (values[:, ~self.water_mask] - self.mean) @ self.loadings
@@ -0,0 +1,165 @@
+#   parsed plate cache
+'''On-disk cache of parsed plate reader workbooks;
+    entries are keyed by the sha256 of the file content
+    and stored as .npz files, least recently used entries are evicted over the size cap;
+    the cache is shared by the background plate loader and batch import, the index is guarded by a lock'''
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+import plate_reader
+
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".ecoplate_analyzer", "plate_cache")
+MAX_CACHE_SIZE = 64 * 1024 * 1024      # bytes
+INDEX_NAME = "index.json"
+
+
+class PlateCache:
+
+    def __init__(self, directory=CACHE_DIR, max_size=MAX_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.index_path = os.path.join(directory, INDEX_NAME)
+
+        # files: path -> [mtime_ns, size, digest]  (fast path without hashing)
+        # entries: digest -> [entry size, last used]
+        self.files = {}
+        self.entries = {}
+        self.changed = False        # index changed since it was last written (last used times alone do not count)
+        self.lock = threading.RLock()       # index and index file; hashing and parsing run outside of it
+
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.index_path, encoding='utf-8') as index_file:
+                index = json.load(index_file)
+            self.files = index.get("files", {})
+            self.entries = index.get("entries", {})
+        except (OSError, ValueError):
+            pass
+
+
+    def digest(self, file_path):
+        """Content hash of the file; unchanged files (same mtime and size) are not read again"""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        with self.lock:
+            known = self.files.get(path)
+        if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            return known[2]
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as plate_file:
+            for chunk in iter(lambda: plate_file.read(1 << 20), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with self.lock:
+            self.files[path] = [stat.st_mtime_ns, stat.st_size, digest]
+            self.changed = True
+        return digest
+
+
+    def get(self, digest):
+        """Returns (wave_590, wave_720, corrected) for the digest or None"""
+        with self.lock:
+            if digest not in self.entries:
+                return None
+            try:
+                with np.load(self.entry_path(digest)) as entry:
+                    waves = (entry["wave_590"], entry["wave_720"], entry["corrected"])
+            except (OSError, ValueError, KeyError):
+                self.remove(digest)
+                return None
+
+            self.entries[digest][1] = time.time()
+            return waves
+
+
+    def put(self, digest, wave_590, wave_720, corrected):
+        entry_path = self.entry_path(digest)
+        with self.lock:
+            temp_path = entry_path + ".tmp"
+            with open(temp_path, 'wb') as entry_file:
+                np.savez(entry_file, wave_590=wave_590, wave_720=wave_720, corrected=corrected)
+            os.replace(temp_path, entry_path)
+
+            self.entries[digest] = [os.path.getsize(entry_path), time.time()]
+            self.changed = True
+            self.evict()
+
+
+    def remove(self, digest):
+        with self.lock:
+            if self.entries.pop(digest, None) is not None:
+                self.changed = True
+            try:
+                os.remove(self.entry_path(digest))
+            except OSError:
+                pass
+
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_size"""
+        with self.lock:
+            total = sum(size for size, _ in self.entries.values())
+            if total <= self.max_size:
+                return
+            for digest in sorted(self.entries, key=lambda d: self.entries[d][1]):
+                total -= self.entries[digest][0]
+                self.remove(digest)
+                if total <= self.max_size:
+                    break
+
+            live = set(self.entries)
+            self.files = {path: known for path, known in self.files.items() if known[2] in live}
+
+
+    def save(self):
+        """Write the index to disk when it changed; last used times of cache hits are written with the next change"""
+        with self.lock:
+            if not self.changed:
+                return
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as index_file:
+                json.dump({"files": self.files, "entries": self.entries}, index_file)
+            os.replace(temp_path, self.index_path)
+            self.changed = False
+
+
+    def entry_path(self, digest):
+        return os.path.join(self.directory, digest + ".npz")
+
+
+    def load(self, file_path):
+        """Returns (wave_590, wave_720, corrected) from the cache or parses and stores the file;
+        the file is parsed without holding the lock"""
+        digest = self.digest(file_path)
+        waves = self.get(digest)
+        if waves is None:
+            wave_590, wave_720 = plate_reader.read_plate_waves(file_path)
+            waves = (wave_590, wave_720, plate_reader.correct_plate(wave_590, wave_720))
+            self.put(digest, *waves)
+        self.save()
+        return waves
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Returns the shared plate cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PlateCache()
+    return _cache
+
+
+def load_plate(file_path):
+    """Returns the corrected 8x12 matrix of the workbook, using the shared cache"""
+    return get_cache().load(file_path)[2]
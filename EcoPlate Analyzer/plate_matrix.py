@@ -0,0 +1,141 @@
+#   columnar plate matrix
+'''Column store of all records: one N x 8 x 4 float32 array of ecoplate values
+    (memory-mapped from disk) and categorical coded columns of record info;
+    row of a record is its id in the record store, the stamp file next to the values
+    names the record store write the file is current with'''
+
+import os
+
+import numpy as np
+
+
+PLATES_PATH = os.path.join(os.path.expanduser("~"), ".ecoplate_analyzer", "plates.f32")
+FIELDS = ["bacteria", "stressor", "concentration", "time", "blank", "repetition", "file_name"]
+PLATE_SHAPE = (8, 4)
+ROW_BYTES = np.dtype(np.float32).itemsize * PLATE_SHAPE[0] * PLATE_SHAPE[1]
+GROWTH = 16384      # rows added at once, keeps remapping of the file rare
+
+
+class PlateMatrix:
+
+    def __init__(self, path=PLATES_PATH):
+        self.path = path
+        self.stamp_path = None if path is None else path + ".stamp"
+        self.stamp = None       # record store stamp the values were written for, None: unknown
+        self.capacity = 0
+        self.values = np.empty((0,) + PLATE_SHAPE, dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+
+        # categorical columns: codes per row, code -> value and value -> code
+        self.codes = {field: np.full(0, -1, dtype=np.int32) for field in FIELDS}
+        self.categories = {field: [] for field in FIELDS}
+        self.category_codes = {field: {} for field in FIELDS}
+
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                rows = os.path.getsize(path) // ROW_BYTES
+                if rows:
+                    self.resize(rows)
+            if os.path.exists(self.stamp_path):
+                with open(self.stamp_path, encoding='utf-8') as stamp_file:
+                    self.stamp = stamp_file.read().strip()
+
+
+    def resize(self, capacity):
+        """Grow all columns to the capacity; new ecoplate rows are NaN (not written)"""
+        old_capacity = self.capacity
+        if self.path is None:
+            values = np.full((capacity,) + PLATE_SHAPE, np.nan, dtype=np.float32)
+            values[:old_capacity] = self.values
+            self.values = values
+        else:
+            self.values = None      # release the old mapping before the file is resized
+            with open(self.path, 'ab') as plates_file:
+                file_capacity = plates_file.tell() // ROW_BYTES
+                if file_capacity < capacity:
+                    plates_file.write(np.full((capacity - file_capacity,) + PLATE_SHAPE, np.nan, dtype=np.float32).tobytes())
+            self.values = np.memmap(self.path, dtype=np.float32, mode='r+', shape=(capacity,) + PLATE_SHAPE)
+
+        self.alive = np.concatenate([self.alive, np.zeros(capacity - old_capacity, dtype=bool)])
+        for field in FIELDS:
+            self.codes[field] = np.concatenate([self.codes[field], np.full(capacity - old_capacity, -1, dtype=np.int32)])
+        self.capacity = capacity
+
+
+    def ensure_capacity(self, rows):
+        if rows > self.capacity:
+            self.resize((rows // GROWTH + 1) * GROWTH)
+
+
+    def code(self, field, value):
+        """Returns the code of the value in the field column, new values get the next code"""
+        codes = self.category_codes[field]
+        if value not in codes:
+            codes[value] = len(self.categories[field])
+            self.categories[field].append(value)
+        return codes[value]
+
+
+    def set_info(self, row, info):
+        """Write record info (values in FIELDS order) to the row"""
+        self.ensure_capacity(row + 1)
+        for field, value in zip(FIELDS, info):
+            self.codes[field][row] = self.code(field, value)
+        self.alive[row] = True
+
+
+    def set_columns(self, rows, columns):
+        """Write record info of many rows at once; columns are lists of values in FIELDS order"""
+        rows = np.asarray(rows, dtype=np.int64)
+        self.ensure_capacity(int(rows.max()) + 1)
+        for field, column in zip(FIELDS, columns):
+            for value in set(column) - self.category_codes[field].keys():
+                self.code(field, value)
+            self.codes[field][rows] = np.fromiter(map(self.category_codes[field].__getitem__, column),
+                                                  dtype=np.int32, count=len(column))
+        self.alive[rows] = True
+
+
+    def set_row(self, row, info, ecoplate):
+        self.set_info(row, info)
+        self.values[row] = ecoplate
+
+
+    def remove_row(self, row):
+        self.alive[row] = False
+
+
+    def value(self, field, row):
+        """Decoded value of the field in the row"""
+        return self.categories[field][self.codes[field][row]]
+
+
+    def missing_rows(self, rows):
+        """Rows without ecoplate values written to the file"""
+        rows = np.asarray(rows, dtype=np.int64)
+        missing = rows >= self.capacity
+        inside = ~missing
+        missing[inside] = np.isnan(self.values[rows[inside]]).all(axis=(1, 2))
+        return rows[missing].tolist()
+
+
+    def set_stamp(self, stamp):
+        """Record the store stamp the written values are current with (after a flush)"""
+        self.stamp = stamp
+        if self.stamp_path is None:
+            return
+        temporary = self.stamp_path + ".tmp"
+        with open(temporary, 'w', encoding='utf-8') as stamp_file:
+            stamp_file.write(stamp)
+        os.replace(temporary, self.stamp_path)
+
+
+    def take(self, rows):
+        """N x 8 x 4 ecoplate values of the rows (copy)"""
+        return self.values[np.asarray(rows, dtype=np.int64)]
+
+
+    def flush(self):
+        if isinstance(self.values, np.memmap):
+            self.values.flush()
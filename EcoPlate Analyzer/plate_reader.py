@@ -0,0 +1,43 @@
+#   plate reader workbook parser
+'''Single-pass parser for plate reader .xlsx exports;
+    both wavelength blocks are read from one streaming pass over the sheet'''
+
+import numpy as np
+from openpyxl import load_workbook
+
+
+# worksheet layout (1-based excel rows, columns B:M)
+WAVE_590_ROWS = (7, 14)
+WAVE_720_ROWS = (20, 27)
+FIRST_COL = 2
+LAST_COL = 13
+
+
+def read_plate_waves(file_path):
+    """Read the 590 nm and 720 nm blocks of a plate reader workbook.
+    Returns two 8x12 float arrays (wave_590, wave_720)."""
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(min_row=WAVE_590_ROWS[0], max_row=WAVE_720_ROWS[1],
+                               min_col=FIRST_COL, max_col=LAST_COL, values_only=True)
+
+        block = np.full((WAVE_720_ROWS[1] - WAVE_590_ROWS[0] + 1, LAST_COL - FIRST_COL + 1), np.nan)
+        for index, row in enumerate(rows):
+            block[index, :len(row)] = [np.nan if value is None else value for value in row]
+    finally:
+        workbook.close()
+
+    wave_590 = block[:WAVE_590_ROWS[1] - WAVE_590_ROWS[0] + 1]
+    wave_720 = block[WAVE_720_ROWS[0] - WAVE_590_ROWS[0]:]
+    return wave_590, wave_720
+
+
+def correct_plate(wave_590, wave_720):
+    """Return the 720 nm corrected 8x12 matrix"""
+    return np.round(wave_590 - wave_720, 3)
+
+
+def read_plate(file_path):
+    """Read a plate reader workbook and return the corrected 8x12 matrix"""
+    return correct_plate(*read_plate_waves(file_path))
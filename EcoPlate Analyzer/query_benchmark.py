@@ -0,0 +1,88 @@
+#   filter micro-benchmark
+'''Compares the bitmap index query with the cartesian product filtering
+    used by the filter window before; run: python query_benchmark.py'''
+
+from itertools import product
+import random
+import time
+
+import query_engine
+
+
+FILTER_FIELDS = query_engine.FIELDS
+SELECTION = {
+    "bacteria": ["B1", "B2", "B3"],
+    "stressor": ["Cu", "Zn"],
+    "concentration": ["0", "5", "10"],
+    "time": ["24", "48"],
+    "blank": [],
+    "repetition": [],
+}
+
+
+def make_records(count, seed=0):
+    """Random record infos {field: value}, one per row"""
+    rng = random.Random(seed)
+    return [{
+        "bacteria": f"B{rng.randrange(20)}",
+        "stressor": rng.choice(["Cu", "Zn", "Cd", "Ni", "Pb", "None"]),
+        "concentration": rng.choice(["0", "1", "5", "10", "50", "100"]),
+        "time": rng.choice(["0", "24", "48", "72"]),
+        "blank": rng.random() < 0.1,
+        "repetition": str(rng.randrange(1, 4)),
+    } for _ in range(count)]
+
+
+def product_filter(records_dict, selection):
+    """Filtering by the cartesian product of the selected values (previous implementation)"""
+    filtered_data = [selection[key] or ['default'] for key in FILTER_FIELDS]
+    results = []
+    for combination in product(*filtered_data):
+        matching_records = None
+        for key, value in zip(FILTER_FIELDS, combination):
+            if value == "default":
+                candidates = set(record for records in records_dict[key].values() for record in records)
+            else:
+                candidates = set(records_dict[key].get(value, []))
+            if matching_records is None:
+                matching_records = candidates
+            else:
+                matching_records.intersection_update(candidates)
+        if matching_records:
+            results.extend(matching_records)
+        results = list(set(results))
+    return results
+
+
+def best_of(function, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def run(count):
+    infos = make_records(count)
+
+    records_dict = {field: {} for field in FILTER_FIELDS}
+    for row, info in enumerate(infos):
+        for field, value in info.items():
+            records_dict[field].setdefault(value, []).append(row)
+
+    index = query_engine.BitmapIndex()
+    index.add(range(count), {field: [info[field] for info in infos] for field in query_engine.FIELDS})
+
+    product_time, product_rows = best_of(lambda: product_filter(records_dict, SELECTION))
+    bitmap_time, bitmap_rows = best_of(lambda: index.query(SELECTION))
+    assert sorted(product_rows) == bitmap_rows.tolist()
+
+    print(f"{count:>7} records, {len(bitmap_rows):>6} matches: "
+          f"product {product_time * 1000:9.2f} ms, bitmap {bitmap_time * 1000:7.2f} ms "
+          f"({product_time / bitmap_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    for count in (10_000, 100_000):
+        run(count)
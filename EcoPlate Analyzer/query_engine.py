@@ -0,0 +1,114 @@
+#   query engine
+'''Bitmap index over record rows for filtering;
+    one bitmap per (field, value) of the nested dictionary,
+    selected values are ORed within a field and ANDed across fields'''
+
+import numpy as np
+
+
+FIELDS = ['bacteria', 'stressor', 'concentration', 'time', 'blank', 'repetition']     # filter fields
+BLOCK_BYTES = 2048      # dense bitmaps grow in blocks of 16384 rows
+SPARSE_RATIO = 64       # a bitmap stays a set of rows while it holds less than 1/64 of the rows
+
+
+class BitmapIndex:
+
+    def __init__(self):
+        # field -> value -> set of rows (sparse) or packed np.uint8 bitmap (dense)
+        self.bitmaps = {field: {} for field in FIELDS}
+        self.alive = np.zeros(0, dtype=np.uint8)    # packed bitmap of all indexed rows
+        self.size = 0                               # rows covered by the bitmaps
+
+
+    @staticmethod
+    def grow(bitmap, nbytes):
+        if len(bitmap) >= nbytes:
+            return bitmap
+        nbytes = (nbytes // BLOCK_BYTES + 1) * BLOCK_BYTES
+        return np.concatenate([bitmap, np.zeros(nbytes - len(bitmap), dtype=np.uint8)])
+
+
+    @staticmethod
+    def set_bits(bitmap, rows):
+        np.bitwise_or.at(bitmap, rows >> 3, (0x80 >> (rows & 7)).astype(np.uint8))
+
+
+    def add(self, rows, columns):
+        """Index rows; columns are {field: list of values of the rows}"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return
+        self.size = max(self.size, int(rows.max()) + 1)
+        nbytes = ((self.size - 1) >> 3) + 1
+        self.alive = self.grow(self.alive, nbytes)
+        self.set_bits(self.alive, rows)
+
+        for field, column in columns.items():
+            # group rows by value: code values, then split the rows sorted by code
+            value_codes = {}
+            codes = np.fromiter((value_codes.setdefault(value, len(value_codes)) for value in column),
+                                dtype=np.int64, count=len(rows))
+            order = np.argsort(codes, kind='stable')
+            bounds = np.flatnonzero(np.diff(codes[order])) + 1
+
+            for value, new_rows in zip(value_codes, np.split(rows[order], bounds)):
+                bitmap = self.bitmaps[field].get(value, set())
+                if isinstance(bitmap, set):
+                    bitmap.update(new_rows.tolist())
+                    if len(bitmap) * SPARSE_RATIO > self.size:
+                        bitmap = self.to_dense(bitmap)
+                else:
+                    bitmap = self.grow(bitmap, nbytes)
+                    self.set_bits(bitmap, new_rows)
+                self.bitmaps[field][value] = bitmap
+
+
+    def remove(self, row, info):
+        """Remove a row from the index; info is {field: value}"""
+        self.alive[row >> 3] &= ~np.uint8(0x80 >> (row & 7))
+
+        for field, value in info.items():
+            bitmap = self.bitmaps[field].get(value)
+            if bitmap is None:
+                continue
+            if isinstance(bitmap, set):
+                bitmap.discard(row)
+                empty = not bitmap
+            else:
+                bitmap[row >> 3] &= ~np.uint8(0x80 >> (row & 7))
+                empty = not bitmap.any()
+            if empty:
+                del self.bitmaps[field][value]
+
+
+    def to_dense(self, rows):
+        bits = np.zeros(len(self.alive) * 8, dtype=bool)
+        bits[np.fromiter(rows, dtype=np.int64, count=len(rows))] = True
+        return np.packbits(bits)
+
+
+    def field_bitmap(self, field, values):
+        """OR of the bitmaps of the selected values of one field"""
+        result = np.zeros(len(self.alive), dtype=np.uint8)
+        sparse_rows = []
+        for value in values:
+            bitmap = self.bitmaps[field].get(value)
+            if bitmap is None:
+                continue
+            if isinstance(bitmap, set):
+                sparse_rows.extend(bitmap)
+            else:
+                result[:len(bitmap)] |= bitmap[:len(result)]
+        if sparse_rows:
+            result |= self.to_dense(sparse_rows)
+        return result
+
+
+    def query(self, selections):
+        """Rows matching the selections {field: [values]} in row order;
+        fields without selected values match every row"""
+        result = self.alive.copy()
+        for field, values in selections.items():
+            if values:
+                result &= self.field_bitmap(field, values)
+        return np.flatnonzero(np.unpackbits(result)[:self.size])
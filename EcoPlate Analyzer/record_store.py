@@ -0,0 +1,117 @@
+#   persistent record store
+'''SQLite storage for ecoplate experiment records;
+    record info is kept in indexed columns, ecoplate values as a packed float32 BLOB;
+    the stamp (store id and write generation) tells copies of the ecoplate values whether they are current'''
+
+import os
+import sqlite3
+import uuid
+
+import numpy as np
+
+
+DB_PATH = os.path.join(os.path.expanduser("~"), ".ecoplate_analyzer", "records.sqlite3")
+INDEXED_COLUMNS = ["bacteria", "stressor", "concentration", "time", "blank", "repetition", "file_name"]
+PLATE_SHAPE = (8, 4)
+
+
+class RecordStore:
+
+    def __init__(self, path=DB_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS records (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    bacteria TEXT NOT NULL,
+                    stressor TEXT NOT NULL,
+                    concentration TEXT NOT NULL,
+                    time TEXT NOT NULL,
+                    blank INTEGER NOT NULL,
+                    repetition TEXT NOT NULL,
+                    file_name TEXT NOT NULL,
+                    ecoplate BLOB NOT NULL
+                )""")
+            for column in INDEXED_COLUMNS:
+                self.connection.execute(f"CREATE INDEX IF NOT EXISTS records_{column} ON records({column})")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('store_id', ?)", (uuid.uuid4().hex,))
+            self.connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', '0')")
+
+        meta = dict(self.connection.execute("SELECT key, value FROM meta"))
+        self.store_id = meta['store_id']
+        self.generation = int(meta['generation'])
+
+
+    def stamp(self):
+        """Store id and generation of the last committed write, changed by every insert and delete"""
+        return f"{self.store_id}:{self.generation}"
+
+
+    def next_generation(self):
+        # inside the transaction of a write; the generation is kept if the transaction is rolled back
+        self.connection.execute("UPDATE meta SET value = ? WHERE key = 'generation'", (str(self.generation + 1),))
+        return self.generation + 1
+
+
+    def load_metadata(self):
+        """Returns (id, bacteria, stressor, concentration, time, blank, repetition, file_name) rows
+        without the ecoplate values"""
+        return self.connection.execute(
+            "SELECT id, bacteria, stressor, concentration, time, blank, repetition, file_name "
+            "FROM records ORDER BY id").fetchall()
+
+
+    def load_ecoplates(self, record_ids):
+        """Returns {id: 8x4 float32 ecoplate values} of the records"""
+        ecoplates = {}
+        for start in range(0, len(record_ids), 500):
+            chunk = record_ids[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT id, ecoplate FROM records WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+            for record_id, blob in rows:
+                ecoplates[record_id] = np.frombuffer(blob, dtype=np.float32).reshape(PLATE_SHAPE)
+        return ecoplates
+
+
+    def insert(self, records, before_commit=None):
+        """Writes records in one transaction and returns their ids.
+        before_commit(ids) is called inside the transaction (stamp() is already the new one),
+        an exception in it rolls the insert back."""
+        record_ids = []
+        generation = self.generation
+        with self.connection:
+            for record in records:
+                cursor = self.connection.execute(
+                    "INSERT INTO records (bacteria, stressor, concentration, time, blank, repetition, file_name, ecoplate) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (record.bacteria, record.stressor, record.concentration, record.time, int(record.blank),
+                     record.repetition, record.file_name,
+                     np.ascontiguousarray(record.ecoplate, dtype=np.float32).tobytes()))
+                record_ids.append(cursor.lastrowid)
+            self.generation = self.next_generation()
+            try:
+                if before_commit is not None:
+                    before_commit(record_ids)
+            except BaseException:
+                self.generation = generation
+                raise
+        return record_ids
+
+
+    def delete(self, records):
+        """Removes records in one transaction"""
+        with self.connection:
+            self.connection.executemany("DELETE FROM records WHERE id = ?",
+                                        [(record.record_id,) for record in records if record.record_id is not None])
+            generation = self.next_generation()
+        self.generation = generation
+
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,113 @@
+#   shared value models
+'''One sorted list model per metadata field, shared by the comboboxes of all windows
+    (no copies of the values); the models follow the AppState value sets by change
+    notifications and editable comboboxes complete typed prefixes in a popup'''
+
+from bisect import bisect_left
+
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex
+from PySide6.QtWidgets import QComboBox, QCompleter
+from shiboken6 import isValid
+
+import app_state
+
+
+FIELDS = ("bacteria", "stressor", "concentration", "time", "repetition", "filename")
+
+
+class ValueListModel(QAbstractListModel):
+    """Sorted values of one field; attached comboboxes keep their text when values come and go"""
+
+    def __init__(self, values=(), parent=None):
+        super().__init__(parent)
+        self.values = sorted(values)
+        self.combo_boxes = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.values)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role in (Qt.DisplayRole, Qt.EditRole) and index.isValid() and index.row() < len(self.values):
+            return self.values[index.row()]
+        return None
+
+    def add(self, value):
+        index = bisect_left(self.values, value)
+        if index < len(self.values) and self.values[index] == value:
+            return
+        texts = self.CurrentTexts()
+        self.beginInsertRows(QModelIndex(), index, index)
+        self.values.insert(index, value)
+        self.endInsertRows()
+        self.RestoreTexts(texts)
+
+    def remove(self, value):
+        index = bisect_left(self.values, value)
+        if index == len(self.values) or self.values[index] != value:
+            return
+        texts = self.CurrentTexts()
+        self.beginRemoveRows(QModelIndex(), index, index)
+        del self.values[index]
+        self.endRemoveRows()
+        self.RestoreTexts(texts)
+
+    def attach(self, combo_box):
+        """Show the values in the combobox; an editable combobox completes typed prefixes and does not insert new values"""
+        if combo_box.model() is self:
+            return
+        text = combo_box.currentText()
+        combo_box.setModel(self)
+        if combo_box.isEditable():
+            combo_box.setInsertPolicy(QComboBox.NoInsert)
+            # the completer created by the combobox on its model; declaring the model sorted would make
+            # the completer rebuild its sorted index on every inserted value
+            completer = combo_box.completer()
+            completer.setCompletionMode(QCompleter.PopupCompletion)
+            completer.setCaseSensitivity(Qt.CaseInsensitive)
+        combo_box.setCurrentText(text)
+        self.combo_boxes.append(combo_box)
+
+    def CurrentTexts(self):
+        # texts of the attached comboboxes, deleted comboboxes are dropped
+        self.combo_boxes = [combo_box for combo_box in self.combo_boxes if isValid(combo_box)]
+        return [combo_box.currentText() for combo_box in self.combo_boxes]
+
+    def RestoreTexts(self, texts):
+        # rows inserted or removed before the current one move the combobox to another value
+        for combo_box, text in zip(self.combo_boxes, texts):
+            if combo_box.currentText() != text:
+                combo_box.setCurrentText(text)
+
+
+class ValueModels:
+    """Shared value models of the fields (single instance), subscribed to the AppState value sets"""
+    _instance = None
+
+    def __init__(self):
+        self.appState = app_state.AppState.get_instance()
+        self.models = {field: ValueListModel(self.appState.value_sets[field]) for field in FIELDS}
+        self.appState.subscribe(self.ValueSetChanged)
+
+    @classmethod
+    def get_instance(cls):
+        """Class method that returns the only instance of ValueModels"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def model(self, field):
+        return self.models[field]
+
+    def ValueSetChanged(self, field, value, added):
+        model = self.models.get(field)
+        if model is None:
+            return
+        if added:
+            model.add(value)
+        else:
+            model.remove(value)
+
+
+def attach(combo_box, field):
+    """Attach the combobox to the shared value model of the field"""
+    ValueModels.get_instance().model(field).attach(combo_box)
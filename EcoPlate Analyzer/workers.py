@@ -0,0 +1,205 @@
+#   background jobs
+'''Cancellable jobs on the Qt thread pool: a job runs a function off the GUI thread,
+    reports its progress and delivers its result by signal (queued to the GUI thread);
+    a newer job of the same name supersedes the running one, whose result is dropped'''
+
+import numpy as np
+from PySide6.QtWidgets import QWidget, QHBoxLayout, QProgressBar, QPushButton, QMessageBox
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+
+CHUNK = 10000       # records between two checkpoints of a job function
+
+
+class Cancelled(Exception):
+    """Raised at a checkpoint of a job function after the job was cancelled"""
+
+
+class JobSignals(QObject):
+    progress = Signal(int, int)         # generation, percent
+    finished = Signal(int, object)      # generation, result
+    failed = Signal(int, str)           # generation, error message
+    done = Signal(int)                  # generation, emitted last in every case
+
+
+class Job(QRunnable):
+    """Runs function(job, *args) in the pool; the function calls job.check() between its steps"""
+
+    def __init__(self, generation, function, args):
+        super().__init__()
+        self.setAutoDelete(False)       # the runner keeps the job until it is done
+        self.generation = generation
+        self.function = function
+        self.args = args
+        self.cancelled = False
+        self.signals = JobSignals()
+
+    def check(self, done=None, total=None):
+        """Checkpoint: raises Cancelled after a cancel, reports the progress done / total"""
+        if self.cancelled:
+            raise Cancelled()
+        if done is not None and total:
+            self.signals.progress.emit(self.generation, int(100 * done / total))
+
+    def run(self):
+        try:
+            if self.cancelled:
+                return      # cancelled while it was queued
+            result = self.function(self, *self.args)
+            if not self.cancelled:
+                self.signals.finished.emit(self.generation, result)
+        except Cancelled:
+            pass
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+        finally:
+            self.signals.done.emit(self.generation)
+
+
+def chunks(total, size=CHUNK):
+    """(start, stop) ranges of size covering 0..total"""
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+class JobRunner(QObject):
+    """Jobs of a window, at most one current job per name; callbacks run in the GUI thread"""
+
+    def __init__(self, parent=None, pool=None):
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self.generation = 0
+        self.current = {}       # name -> current job
+        self.callbacks = {}     # generation -> (name, finished, progress, failed) of the current jobs
+        self.live = {}          # generation -> job, until the job is done (cancelled jobs too)
+
+    def submit(self, name, function, *args, finished=None, progress=None, failed=None):
+        """Run function(job, *args) in the pool; a running job of the same name is cancelled"""
+        self.cancel(name)
+        self.generation += 1
+        job = Job(self.generation, function, args)
+        job.signals.progress.connect(self.JobProgress)
+        job.signals.finished.connect(self.JobFinished)
+        job.signals.failed.connect(self.JobFailed)
+        job.signals.done.connect(self.JobDone)
+
+        self.current[name] = job
+        self.callbacks[job.generation] = (name, finished, progress, failed)
+        self.live[job.generation] = job
+        self.pool.start(job)
+        return job
+
+    def cancel(self, name):
+        """Cancel the current job of the name, its result is never delivered;
+        a job still waiting in the pool is taken out of it and never runs"""
+        job = self.current.pop(name, None)
+        if job is not None:
+            job.cancelled = True
+            self.callbacks.pop(job.generation, None)
+            if self.pool.tryTake(job):
+                self.live.pop(job.generation, None)     # not started, done is never emitted
+
+    def running(self, name):
+        return name in self.current
+
+    def wait(self, msecs=-1):
+        """Wait for all jobs of the pool (closing windows, scripts)"""
+        return self.pool.waitForDone(msecs)
+
+    # slots, called in the GUI thread
+    def JobProgress(self, generation, percent):
+        callbacks = self.callbacks.get(generation)
+        if callbacks is not None and callbacks[2] is not None:
+            callbacks[2](percent)
+
+    def JobFinished(self, generation, result):
+        callbacks = self.callbacks.pop(generation, None)
+        if callbacks is None:
+            return      # superseded or cancelled
+        name, finished, _, _ = callbacks
+        self.current.pop(name, None)
+        if finished is not None:
+            finished(result)
+
+    def JobFailed(self, generation, message):
+        callbacks = self.callbacks.pop(generation, None)
+        if callbacks is None:
+            return
+        name, _, _, failed = callbacks
+        self.current.pop(name, None)
+        if failed is not None:
+            failed(message)
+
+    def JobDone(self, generation):
+        self.live.pop(generation, None)
+
+
+class JobProgress(QWidget):
+    """Progress bar and cancel button of the background jobs of a window, shown while a job runs"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.jobs = JobRunner(self)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        cancel_button = QPushButton("Cancel")
+        cancel_button.setFixedWidth(150)
+        cancel_button.clicked.connect(self.CancelJobs)
+
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(cancel_button)
+        self.setLayout(layout)
+        self.hide()
+
+    def submit(self, name, function, *args, finished=None):
+        """Run a job of the name in the background, finished(result) is called in the GUI thread"""
+        self.progress_bar.setValue(0)
+        self.show()
+
+        def job_finished(result):
+            self.JobEnded()
+            if finished is not None:
+                finished(result)
+
+        return self.jobs.submit(name, function, *args, finished=job_finished,
+                                progress=self.progress_bar.setValue, failed=self.JobFailed)
+
+    def CancelJobs(self):
+        for name in list(self.jobs.current):
+            self.jobs.cancel(name)
+        self.JobEnded()
+
+    def JobEnded(self):
+        if not self.jobs.current:
+            self.hide()
+
+    def JobFailed(self, message):
+        self.JobEnded()
+        QMessageBox.critical(self.window(), "Error", f"An error occurred in a background job:\n{message}")
+
+
+def filter_inputs(appState, selections, sources=(), groups=()):
+    """Inputs of a filter job taken in the GUI thread (jobs do not touch the app state): the records matching
+    the selections, a copy of their plates, the display mode (0 plate, 1 sources, 2 groups),
+    the carbon source labels and their well indices (None: whole plates)"""
+    results = appState.query(selections)
+    labels, wells = appState.carbon_projection(sources, groups) if sources or groups else ([], None)
+    mode = 0 if wells is None else 1 if sources else 2
+    return results, appState.take_plates(results), mode, labels, wells
+
+
+def filter_job(job, results, plates, mode, labels, wells):
+    """Values of the filtered records gathered chunk by chunk from the copied plates: the plates
+    or the wells of the selected carbon sources (groups); returns the records, the values, the display mode
+    and the carbon source labels"""
+    def gather(part):
+        return part if wells is None else part[:, wells // 4, wells % 4]
+
+    parts = [gather(plates[:0])]
+    for start, stop in chunks(len(results)):
+        parts.append(gather(plates[start:stop]))
+        job.check(stop, len(results))
+
+    return results, np.concatenate(parts), mode, labels